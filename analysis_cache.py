@@ -0,0 +1,98 @@
+# analysis_cache.py
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis (
+    position TEXT NOT NULL,
+    search_limit TEXT NOT NULL,
+    move TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (position, search_limit)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS analysis_last_used ON analysis (last_used);
+"""
+
+
+def normalize_fen(fen: str) -> str:
+    # Move counters don't change the best move, so positions that differ only there share an entry
+    return " ".join(fen.split()[:4])
+
+
+def limit_key(limit) -> str:
+    if isinstance(limit, str):
+        return limit
+    fields = ("time", "depth", "nodes", "mate")
+    return ",".join(f"{name}={getattr(limit, name)}" for name in fields if getattr(limit, name, None) is not None)
+
+
+class AnalysisCache:
+    # Best moves keyed by position and search limit, kept in SQLite so they survive restarts.
+    # WAL mode lets any number of processes read while one writes; each process opens its own connection.
+    def __init__(self, path: str, max_entries: int = 1_000_000, prune_every: int = 1024, timeout: float = 30.0,
+                 touch_interval: float = 3600.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def get(self, fen: str, limit) -> Optional[str]:
+        key = (normalize_fen(fen), limit_key(limit))
+        with self._lock:
+            row = self._db.execute(
+                "SELECT move, last_used FROM analysis WHERE position = ? AND search_limit = ?", key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Recency is only tracked to within touch_interval, so most hits stay pure reads
+            # and don't queue up behind other processes for the write lock
+            now = time.time()
+            if now - row[1] >= self.touch_interval:
+                self._db.execute("UPDATE analysis SET last_used = ? WHERE position = ? AND search_limit = ?",
+                                 (now, *key))
+        return row[0]
+
+    def put(self, fen: str, limit, move: str):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?)",
+                             (normalize_fen(fen), limit_key(limit), move, time.time()))
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune()
+
+    def _prune(self):
+        # Once the table outgrows its budget, the entries touched longest ago go first (to within touch_interval)
+        count = self._db.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM analysis WHERE (position, search_limit) IN "
+                "(SELECT position, search_limit FROM analysis ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM analysis")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,224 @@
+# batch_eval.py
+
+import argparse
+import random
+import sys
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bitboard import BB_FILE_A, BB_FILE_H, COLORS, PIECE_TYPES
+from board import Board
+from search import KING_ENDGAME_VALUES, PIECE_VALUES, SQUARE_VALUES, evaluate
+
+# Plane index is color * 6 + piece type, in COLORS x PIECE_TYPES order
+PLANES = [(color, name) for color in COLORS for name in PIECE_TYPES]
+PLANE_INDEX = {key: index for index, key in enumerate(PLANES)}
+
+_ALL = np.uint64(0xFFFF_FFFF_FFFF_FFFF)
+_NOT_A = np.uint64(~BB_FILE_A & 0xFFFF_FFFF_FFFF_FFFF)
+_NOT_H = np.uint64(~BB_FILE_H & 0xFFFF_FFFF_FFFF_FFFF)
+_NOT_AB = np.uint64(~(BB_FILE_A | BB_FILE_A << 1) & 0xFFFF_FFFF_FFFF_FFFF)
+_NOT_GH = np.uint64(~(BB_FILE_H | BB_FILE_H >> 1) & 0xFFFF_FFFF_FFFF_FFFF)
+_RANK_3 = np.uint64(0xFF << 16)
+_RANK_6 = np.uint64(0xFF << 40)
+
+# (shift, mask) pairs; a positive shift moves towards h8, and the mask drops squares that wrapped a file
+KNIGHT_STEPS = [(17, _NOT_A), (15, _NOT_H), (10, _NOT_AB), (6, _NOT_GH),
+                (-6, _NOT_AB), (-10, _NOT_GH), (-15, _NOT_A), (-17, _NOT_H)]
+ROOK_STEPS = [(8, _ALL), (-8, _ALL), (1, _NOT_A), (-1, _NOT_H)]
+BISHOP_STEPS = [(9, _NOT_A), (7, _NOT_H), (-7, _NOT_A), (-9, _NOT_H)]
+KING_STEPS = ROOK_STEPS + BISHOP_STEPS
+PAWN_CAPTURE_STEPS = {'w': [(9, _NOT_A), (7, _NOT_H)], 'b': [(-7, _NOT_A), (-9, _NOT_H)]}
+
+
+def _square_table(values) -> np.ndarray:
+    # White adds, Black subtracts, so a dot product with the planes gives White's score
+    table = np.zeros((len(PLANES), 64), dtype=np.int32)
+    for index, (color, name) in enumerate(PLANES):
+        sign = 1 if color == 'w' else -1
+        table[index] = [sign * value for value in values(name)[color]]
+    return table
+
+
+SQUARE_TABLE = _square_table(lambda name: SQUARE_VALUES[name])
+ENDGAME_SQUARE_TABLE = _square_table(lambda name: KING_ENDGAME_VALUES if name == 'k' else SQUARE_VALUES[name])
+NON_PAWN_VALUES = np.array([PIECE_VALUES[name] if name in 'nbrq' else 0 for _, name in PLANES], dtype=np.int64)
+
+
+class PositionBatch(NamedTuple):
+    bitboards: np.ndarray  # (N, 12) uint64
+    white_to_move: np.ndarray  # (N,) bool
+
+    def __len__(self) -> int:
+        return len(self.white_to_move)
+
+    def pieces(self, color: str, name: str) -> np.ndarray:
+        return self.bitboards[:, PLANE_INDEX[color, name]]
+
+    def occupancy(self, color: str) -> np.ndarray:
+        offset = COLORS.index(color) * len(PIECE_TYPES)
+        return np.bitwise_or.reduce(self.bitboards[:, offset:offset + len(PIECE_TYPES)], axis=1)
+
+
+def pack(boards: Sequence[Board]) -> PositionBatch:
+    bitboards = np.array([[board.position.pieces[color][name] for color, name in PLANES] for board in boards],
+                         dtype=np.uint64).reshape(len(boards), len(PLANES))
+    white_to_move = np.array([board.current_turn == 'w' for board in boards], dtype=bool)
+    return PositionBatch(bitboards, white_to_move)
+
+
+def pack_fens(fens: Sequence[str]) -> PositionBatch:
+    return pack([Board.from_fen(fen) for fen in fens])
+
+
+def planes(batch: PositionBatch) -> np.ndarray:
+    # (N, 12, 8, 8) of 0/1, indexed [rank][file] with rank 1 first
+    raw = batch.bitboards.astype('<u8').view(np.uint8).reshape(len(batch), len(PLANES), 8)
+    return np.unpackbits(raw, axis=-1, bitorder='little').reshape(len(batch), len(PLANES), 8, 8)
+
+
+def popcount(bitboards: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(bitboards).astype(np.int64)
+
+
+def _shift(bitboards: np.ndarray, step: int) -> np.ndarray:
+    return bitboards << np.uint64(step) if step > 0 else bitboards >> np.uint64(-step)
+
+
+def _step(bitboards: np.ndarray, step: int, mask: np.uint64) -> np.ndarray:
+    return _shift(bitboards, step) & mask
+
+
+def _slide(bitboards: np.ndarray, empty: np.ndarray, step: int, mask: np.uint64) -> np.ndarray:
+    # Kogge-Stone fill: three doubling steps flood every ray up to and including its first blocker
+    open_squares = empty & mask
+    bitboards = bitboards | (open_squares & _shift(bitboards, step))
+    open_squares = open_squares & _shift(open_squares, step)
+    bitboards = bitboards | (open_squares & _shift(bitboards, 2 * step))
+    open_squares = open_squares & _shift(open_squares, 2 * step)
+    bitboards = bitboards | (open_squares & _shift(bitboards, 4 * step))
+    return _step(bitboards, step, mask)
+
+
+def _attack_rays(batch: PositionBatch, color: str, occupied: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+    # One attack set per piece type and direction. Two pieces of the same type never share a square
+    # in the same direction's set (the rear ray stops on the front piece), so counting bits per set is exact.
+    empty = ~occupied
+    rays = []
+    for step, mask in PAWN_CAPTURE_STEPS[color]:
+        rays.append(('p', _step(batch.pieces(color, 'p'), step, mask)))
+    for step, mask in KNIGHT_STEPS:
+        rays.append(('n', _step(batch.pieces(color, 'n'), step, mask)))
+    for name, steps in (('b', BISHOP_STEPS), ('r', ROOK_STEPS), ('q', KING_STEPS)):
+        pieces = batch.pieces(color, name)
+        for step, mask in steps:
+            rays.append((name, _slide(pieces, empty, step, mask)))
+    for step, mask in KING_STEPS:
+        rays.append(('k', _step(batch.pieces(color, 'k'), step, mask)))
+    return rays
+
+
+def attack_maps(batch: PositionBatch) -> np.ndarray:
+    # (N, 2) uint64 of every square attacked by White and by Black
+    occupied = batch.occupancy('w') | batch.occupancy('b')
+    maps = np.zeros((len(batch), len(COLORS)), dtype=np.uint64)
+    for index, color in enumerate(COLORS):
+        for _, attacks in _attack_rays(batch, color, occupied):
+            maps[:, index] |= attacks
+    return maps
+
+
+def in_check(batch: PositionBatch, maps: Optional[np.ndarray] = None) -> np.ndarray:
+    # Whether the side to move is in check
+    if maps is None:
+        maps = attack_maps(batch)
+    white_checked = (batch.pieces('w', 'k') & maps[:, 1]) != 0
+    black_checked = (batch.pieces('b', 'k') & maps[:, 0]) != 0
+    return np.where(batch.white_to_move, white_checked, black_checked)
+
+
+def mobility(batch: PositionBatch) -> np.ndarray:
+    # (N, 2) pseudo-legal move counts. Pins and checks are ignored, promotions count once,
+    # and castling and en passant are left out.
+    own = {color: batch.occupancy(color) for color in COLORS}
+    occupied = own['w'] | own['b']
+    empty = ~occupied
+    counts = np.zeros((len(batch), len(COLORS)), dtype=np.int64)
+    for index, color in enumerate(COLORS):
+        enemy = own[COLORS[1 - index]]
+        for name, attacks in _attack_rays(batch, color, occupied):
+            # Pawns only move diagonally when capturing
+            counts[:, index] += popcount(attacks & (enemy if name == 'p' else ~own[color]))
+        pawns = batch.pieces(color, 'p')
+        push, double_rank = (8, _RANK_3) if color == 'w' else (-8, _RANK_6)
+        single = _shift(pawns, push) & empty
+        double = _shift(single & double_rank, push) & empty
+        counts[:, index] += popcount(single) + popcount(double)
+    return counts
+
+
+def evaluate_batch(batch: PositionBatch) -> np.ndarray:
+    # Same material plus piece-square score as search.evaluate, from the side to move's point of view
+    squares = planes(batch).reshape(len(batch), len(PLANES) * 64).astype(np.int32)
+    non_pawn_material = popcount(batch.bitboards) @ NON_PAWN_VALUES
+    middlegame = squares @ SQUARE_TABLE.reshape(-1)
+    endgame = squares @ ENDGAME_SQUARE_TABLE.reshape(-1)
+    score = np.where(non_pawn_material <= 1300, endgame, middlegame)
+    return np.where(batch.white_to_move, score, -score)
+
+
+def random_positions(count: int, max_plies: int = 80, seed: int = 0) -> List[Board]:
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        board = Board()
+        for _ in range(rng.randint(0, max_plies)):
+            moves = board.legal_moves()
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        boards.append(Board.from_fen(board.fen()))
+    return boards
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate many positions at once and compare with the scalar path.")
+    parser.add_argument("fens", nargs="?", help="file with one FEN per line (default: random positions)")
+    parser.add_argument("--count", type=int, default=2000, help="random positions to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.fens:
+        with open(args.fens) as handle:
+            boards = [Board.from_fen(line.strip()) for line in handle if line.strip()]
+    else:
+        boards = random_positions(args.count, seed=args.seed)
+
+    start = time.perf_counter()
+    scalar = [evaluate(board) for board in boards]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = pack(boards)
+    packed = time.perf_counter()
+    scores = evaluate_batch(batch)
+    maps = attack_maps(batch)
+    checks = in_check(batch, maps)
+    moves = mobility(batch)
+    batch_time = time.perf_counter() - packed
+
+    mismatches = int(np.count_nonzero(scores != np.array(scalar)))
+    print(f"{len(boards)} positions, {int(checks.sum())} in check, mean mobility {moves.mean(axis=0).round(1).tolist()}")
+    print(f"scalar evaluate: {scalar_time:.3f}s ({len(boards) / scalar_time:,.0f} positions/s)")
+    print(f"batch evaluate + attacks + mobility: {batch_time:.3f}s ({len(boards) / batch_time:,.0f} positions/s), "
+          f"packing {packed - start:.3f}s")
+    if mismatches:
+        print(f"{mismatches} evaluations differ from search.evaluate", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
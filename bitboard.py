@@ -0,0 +1,277 @@
+# bitboard.py
+
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+WHITE, BLACK = 'w', 'b'
+COLORS = (WHITE, BLACK)
+PIECE_TYPES = ('p', 'n', 'b', 'r', 'q', 'k')
+
+# Squares are numbered a1 = 0 ... h8 = 63, the same layout python-chess uses.
+# The GUI works in (row, col) with row 0 being the 8th rank.
+BB_ALL = 0xFFFF_FFFF_FFFF_FFFF
+BB_FILE_A = 0x0101_0101_0101_0101
+BB_FILE_H = BB_FILE_A << 7
+BB_RANK_1 = 0xFF
+BB_RANK_8 = BB_RANK_1 << 56
+
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+CASTLE_ALL = CASTLE_WK | CASTLE_WQ | CASTLE_BK | CASTLE_BQ
+
+
+def square_index(pos: Tuple[int, int]) -> int:
+    row, col = pos
+    return (7 - row) * 8 + col
+
+
+def square_pos(square: int) -> Tuple[int, int]:
+    return 7 - (square >> 3), square & 7
+
+
+def iter_squares(bb: int) -> Iterator[int]:
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def _leaper_table(offsets: List[Tuple[int, int]]) -> List[int]:
+    table = []
+    for square in range(64):
+        rank, file = square >> 3, square & 7
+        bb = 0
+        for d_rank, d_file in offsets:
+            r, f = rank + d_rank, file + d_file
+            if 0 <= r < 8 and 0 <= f < 8:
+                bb |= 1 << (r * 8 + f)
+        table.append(bb)
+    return table
+
+
+def _ray_table(d_rank: int, d_file: int) -> List[int]:
+    table = []
+    for square in range(64):
+        r, f = (square >> 3) + d_rank, (square & 7) + d_file
+        bb = 0
+        while 0 <= r < 8 and 0 <= f < 8:
+            bb |= 1 << (r * 8 + f)
+            r, f = r + d_rank, f + d_file
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_table([(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)])
+KING_ATTACKS = _leaper_table([(1, 1), (1, 0), (1, -1), (0, 1), (0, -1), (-1, 1), (-1, 0), (-1, -1)])
+PAWN_ATTACKS: Dict[str, List[int]] = {
+    WHITE: _leaper_table([(1, -1), (1, 1)]),
+    BLACK: _leaper_table([(-1, -1), (-1, 1)]),
+}
+
+# (ray grows towards higher squares, ray table) for each sliding direction
+ROOK_RAYS = [(d_rank * 8 + d_file > 0, _ray_table(d_rank, d_file))
+             for d_rank, d_file in ((1, 0), (-1, 0), (0, 1), (0, -1))]
+BISHOP_RAYS = [(d_rank * 8 + d_file > 0, _ray_table(d_rank, d_file))
+               for d_rank, d_file in ((1, 1), (1, -1), (-1, 1), (-1, -1))]
+
+
+def _slide(square: int, occupied: int, rays) -> int:
+    attacks = 0
+    for positive, table in rays:
+        ray = table[square]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    return _slide(square, occupied, ROOK_RAYS)
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    return _slide(square, occupied, BISHOP_RAYS)
+
+
+def queen_attacks(square: int, occupied: int) -> int:
+    return _slide(square, occupied, ROOK_RAYS) | _slide(square, occupied, BISHOP_RAYS)
+
+
+def _between_table() -> List[List[int]]:
+    table = [[0] * 64 for _ in range(64)]
+    for _, rays in ROOK_RAYS + BISHOP_RAYS:
+        for start in range(64):
+            for end in iter_squares(rays[start]):
+                table[start][end] = rays[start] ^ rays[end] ^ (1 << end)
+    return table
+
+
+# Squares strictly between two squares sharing a rank, file or diagonal
+BETWEEN = _between_table()
+
+# Castling rights that survive a move touching the given square
+CASTLING_KEEP = [CASTLE_ALL] * 64
+CASTLING_KEEP[4] &= ~(CASTLE_WK | CASTLE_WQ)
+CASTLING_KEEP[0] &= ~CASTLE_WQ
+CASTLING_KEEP[7] &= ~CASTLE_WK
+CASTLING_KEEP[60] &= ~(CASTLE_BK | CASTLE_BQ)
+CASTLING_KEEP[56] &= ~CASTLE_BQ
+CASTLING_KEEP[63] &= ~CASTLE_BK
+
+
+# Zobrist keys, fixed by seed so hashes are stable between runs and processes
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES: Dict[Tuple[str, str], List[int]] = {
+    (color, name): [_zobrist_random.getrandbits(64) for _ in range(64)]
+    for color in COLORS for name in PIECE_TYPES
+}
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP_FILE = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
+SLIDERS = ('b', 'r', 'q')
+
+
+class Position:
+    def __init__(self):
+        self.pieces: Dict[str, Dict[str, int]] = {color: dict.fromkeys(PIECE_TYPES, 0) for color in COLORS}
+        self.occupancy: Dict[str, int] = {WHITE: 0, BLACK: 0}
+        self.occupied = 0
+        self.squares: List[Optional[Tuple[str, str]]] = [None] * 64
+        self.kings: Dict[str, Optional[int]] = {WHITE: None, BLACK: None}
+        self.castling = 0
+        self.ep_square: Optional[int] = None
+        self.hash = ZOBRIST_CASTLING[0]
+        # FEN text per rank, dropped whenever a square on that rank changes
+        self._rank_fen: List[Optional[str]] = [None] * 8
+        self._board_fen: Optional[str] = None
+        # Squares attacked by the piece on each square, kept current by put/remove
+        self.attack_sets: List[int] = [0] * 64
+        self.sliders = 0
+        self._attack_maps: Dict[str, int] = {}
+
+    def put(self, square: int, color: str, name: str):
+        mask = 1 << square
+        self.pieces[color][name] |= mask
+        self.occupancy[color] |= mask
+        self.occupied |= mask
+        self.squares[square] = (color, name)
+        self.hash ^= ZOBRIST_PIECES[color, name][square]
+        self._rank_fen[square >> 3] = self._board_fen = None
+        if name == 'k':
+            self.kings[color] = square
+        elif name in SLIDERS:
+            self.sliders |= mask
+        self._update_attacks(square)
+
+    def remove(self, square: int) -> Optional[Tuple[str, str]]:
+        occupant = self.squares[square]
+        if occupant is not None:
+            color, name = occupant
+            mask = ~(1 << square)
+            self.pieces[color][name] &= mask
+            self.occupancy[color] &= mask
+            self.occupied &= mask
+            self.sliders &= mask
+            self.squares[square] = None
+            self.hash ^= ZOBRIST_PIECES[occupant][square]
+            self._rank_fen[square >> 3] = self._board_fen = None
+            if name == 'k':
+                self.kings[color] = None
+            self._update_attacks(square)
+        return occupant
+
+    def move(self, start: int, end: int):
+        color, name = self.remove(start)
+        self.put(end, color, name)
+
+    def board_fen(self) -> str:
+        if self._board_fen is None:
+            for rank in range(8):
+                if self._rank_fen[rank] is None:
+                    self._rank_fen[rank] = self._render_rank(rank)
+            self._board_fen = '/'.join(reversed(self._rank_fen))
+        return self._board_fen
+
+    def _render_rank(self, rank: int) -> str:
+        text = ''
+        empty = 0
+        for occupant in self.squares[rank * 8:rank * 8 + 8]:
+            if occupant is None:
+                empty += 1
+                continue
+            if empty:
+                text += str(empty)
+                empty = 0
+            color, name = occupant
+            text += name.upper() if color == WHITE else name
+        return text + str(empty) if empty else text
+
+    def set_castling(self, rights: int):
+        self.hash ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_CASTLING[rights]
+        self.castling = rights
+
+    def set_ep_square(self, square: Optional[int]):
+        if self.ep_square is not None:
+            self.hash ^= ZOBRIST_EP_FILE[self.ep_square & 7]
+        if square is not None:
+            self.hash ^= ZOBRIST_EP_FILE[square & 7]
+        self.ep_square = square
+
+    def _update_attacks(self, square: int):
+        # Only sliders whose rays reach the changed square see a different board
+        mask = 1 << square
+        attack_sets = self.attack_sets
+        for slider in iter_squares(self.sliders & ~mask):
+            if attack_sets[slider] & mask:
+                attack_sets[slider] = self.attacks_from(slider)
+        attack_sets[square] = self.attacks_from(square) if self.squares[square] else 0
+        self._attack_maps = {}
+
+    def king_square(self, color: str) -> Optional[int]:
+        return self.kings[color]
+
+    def attacks_from(self, square: int, occupied: Optional[int] = None) -> int:
+        color, name = self.squares[square]
+        if occupied is None:
+            occupied = self.occupied
+        if name == 'p':
+            return PAWN_ATTACKS[color][square]
+        if name == 'n':
+            return KNIGHT_ATTACKS[square]
+        if name == 'b':
+            return bishop_attacks(square, occupied)
+        if name == 'r':
+            return rook_attacks(square, occupied)
+        if name == 'q':
+            return queen_attacks(square, occupied)
+        return KING_ATTACKS[square]
+
+    def attack_map(self, color: str) -> int:
+        attacks = self._attack_maps.get(color)
+        if attacks is None:
+            attacks = 0
+            attack_sets = self.attack_sets
+            for square in iter_squares(self.occupancy[color]):
+                attacks |= attack_sets[square]
+            self._attack_maps[color] = attacks
+        return attacks
+
+    def attackers_to(self, square: int, color: str, occupied: Optional[int] = None) -> int:
+        # Look outward from the square for each kind of attacker instead of sweeping the board
+        pieces = self.pieces[color]
+        if occupied is None:
+            occupied = self.occupied
+        queens = pieces['q']
+        return ((KNIGHT_ATTACKS[square] & pieces['n'])
+                | (KING_ATTACKS[square] & pieces['k'])
+                | (PAWN_ATTACKS[BLACK if color == WHITE else WHITE][square] & pieces['p'])
+                | (rook_attacks(square, occupied) & (pieces['r'] | queens))
+                | (bishop_attacks(square, occupied) & (pieces['b'] | queens)))
+
+    def is_attacked(self, square: int, color: str) -> bool:
+        return bool(self.attack_map(color) & (1 << square))
@@ -1,119 +1,394 @@
 # board.py
 
-import pygame
-from pieces import Piece, Pawn, Rook, Knight, Bishop, Queen, King, is_checked
-from typing import List, Optional, Tuple
-from utils import draw_message  # Import from the new utils module
+import os
+import re
+from enum import Enum
+from bitboard import (Position, square_index, square_pos, CASTLE_ALL, CASTLING_KEEP, PAWN_ATTACKS,
+                      BB_RANK_1, BB_RANK_8, CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ, ZOBRIST_BLACK_TO_MOVE)
+from cache import LRUCache
+from instrumentation import counted, timed
+from pieces import Piece, PIECE_CLASSES, is_checked
+from move import Move, FILES
+from movegen import generate_legal_moves
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+SAN_PATTERN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQnbrq]))?$")
+
+
+class MoveStatus(Enum):
+    OK = "ok"
+    INVALID = "Invalid Move"
+    IN_CHECK = "King is in Check"
+
+    def __bool__(self) -> bool:
+        return self is MoveStatus.OK
+
+
+class UndoRecord(NamedTuple):
+    move: Move
+    captured: Optional[Tuple[str, str]]
+    castling: int
+    ep_square: Optional[int]
+    halfmove_clock: int
+    key: int
+
+
+# Derived results shared by every board in the process, keyed by Zobrist hash. Entries are lists of
+# shared Move objects, under 1 KB each, so the default bound keeps the cache around 35 MB per process.
+POSITION_CACHE = LRUCache(maxsize=int(os.environ.get("CHESS_POSITION_CACHE_SIZE", 50_000)))
+
 
 class Board:
-    def __init__(self):
-        self.board: List[List[Optional[Piece]]] = [[None for _ in range(8)] for _ in range(8)]
+    def __init__(self, fen: Optional[str] = None):
+        self.position = Position()
         self.current_turn = 'w'
-        self.setup_board()
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self._stack: List[UndoRecord] = []
+        self._pieces: Dict[Tuple[str, str], Piece] = {}
+        self._view: Optional[List[List[Optional[Piece]]]] = None
+        self._moves_from: Dict[int, List[Move]] = {}
+        if fen is not None:
+            self.set_fen(fen)
+        else:
+            self.setup_board()
+
+    @classmethod
+    def from_fen(cls, fen: str) -> 'Board':
+        return cls(fen)
 
     def setup_board(self):
         # Setup pawns
-        for i in range(8):
-            self.board[1][i] = Pawn('b')
-            self.board[6][i] = Pawn('w')
-
-        # Setup rooks
-        self.board[0][0] = self.board[0][7] = Rook('b')
-        self.board[7][0] = self.board[7][7] = Rook('w')
-
-        # Setup knights
-        self.board[0][1] = self.board[0][6] = Knight('b')
-        self.board[7][1] = self.board[7][6] = Knight('w')
-
-        # Setup bishops
-        self.board[0][2] = self.board[0][5] = Bishop('b')
-        self.board[7][2] = self.board[7][5] = Bishop('w')
-
-        # Setup queens and kings
-        self.board[0][3] = Queen('b')
-        self.board[0][4] = King('b')
-
-        self.board[7][3] = Queen('w')
-        self.board[7][4] = King('w')
-
-    def draw(self, win: pygame.Surface):
-        colors = [pygame.Color(235, 236, 208), pygame.Color(119, 149, 86)]
-        for row in range(8):
-            for col in range(8):
-                color = colors[(row + col) % 2]
-                pygame.draw.rect(win, color, pygame.Rect(col * 80, row * 80, 80, 80))
-                piece = self.board[row][col]
-                if piece:
-                    win.blit(piece.image, pygame.Rect(col * 80, row * 80, 80, 80))
+        for col in range(8):
+            self.position.put(square_index((1, col)), 'b', 'p')
+            self.position.put(square_index((6, col)), 'w', 'p')
+
+        # Setup rooks, knights, bishops, queens and kings
+        for col, name in enumerate("rnbqkbnr"):
+            self.position.put(square_index((0, col)), 'b', name)
+            self.position.put(square_index((7, col)), 'w', name)
+
+        self.position.set_castling(CASTLE_ALL)
+        self._position_changed()
+
+    def set_fen(self, fen: str):
+        fields = fen.split()
+        if len(fields) not in (4, 6):
+            raise ValueError(f"FEN needs 4 or 6 fields: {fen!r}")
+        placement, turn, castling, ep = fields[:4]
+        ranks = placement.split('/')
+        if len(ranks) != 8:
+            raise ValueError(f"FEN placement needs 8 ranks: {placement!r}")
+        if turn not in ('w', 'b'):
+            raise ValueError(f"Invalid side to move in FEN: {turn!r}")
+        if castling != '-' and (not castling or any(char not in "KQkq" for char in castling)):
+            raise ValueError(f"Invalid castling field in FEN: {castling!r}")
+        # The square a pawn just skipped is on rank 6 when White is to move and rank 3 when Black is
+        if ep != '-' and (len(ep) != 2 or ep[0] not in FILES or ep[1] != ('6' if turn == 'w' else '3')):
+            raise ValueError(f"Invalid en passant square in FEN: {ep!r}")
+        try:
+            halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f"Invalid move counters in FEN: {fen!r}") from None
+        if halfmove_clock < 0 or fullmove_number < 1:
+            raise ValueError(f"Invalid move counters in FEN: {fen!r}")
+
+        position = Position()
+        for rank, row in enumerate(reversed(ranks)):
+            file = 0
+            for char in row:
+                if char in "12345678":
+                    file += int(char)
+                elif char.lower() in PIECE_CLASSES and file < 8:
+                    position.put(rank * 8 + file, 'w' if char.isupper() else 'b', char.lower())
+                    file += 1
+                else:
+                    raise ValueError(f"Invalid FEN rank: {row!r}")
+            if file != 8:
+                raise ValueError(f"FEN rank does not cover 8 files: {row!r}")
+        for color in ('w', 'b'):
+            if position.pieces[color]['k'].bit_count() != 1:
+                raise ValueError(f"FEN must have exactly one king per side: {placement!r}")
+            if position.pieces[color]['p'] & (BB_RANK_1 | BB_RANK_8):
+                raise ValueError(f"FEN has a pawn on the first or last rank: {placement!r}")
+
+        # Drop rights whose king or rook has left its home square
+        rights = 0
+        for char, right, king, rook, color in (('K', CASTLE_WK, 4, 7, 'w'), ('Q', CASTLE_WQ, 4, 0, 'w'),
+                                               ('k', CASTLE_BK, 60, 63, 'b'), ('q', CASTLE_BQ, 60, 56, 'b')):
+            if char in castling and position.squares[king] == (color, 'k') and \
+                    position.squares[rook] == (color, 'r'):
+                rights |= right
+        position.set_castling(rights)
+        if ep != '-':
+            ep_square = FILES.index(ep[0]) + (int(ep[1]) - 1) * 8
+            enemy = 'b' if turn == 'w' else 'w'
+            forward = -8 if turn == 'w' else 8
+            if position.squares[ep_square + forward] != (enemy, 'p') or position.squares[ep_square] or \
+                    position.squares[ep_square - forward]:
+                raise ValueError(f"En passant square {ep!r} does not follow a double pawn push: {fen!r}")
+            if PAWN_ATTACKS[enemy][ep_square] & position.pieces[turn]['p']:
+                position.set_ep_square(ep_square)
+
+        self.position = position
+        self.current_turn = turn
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        self._stack = []
+        self._position_changed()
+
+    def fen(self) -> str:
+        position = self.position
+        castling = ''.join(char for char, right in zip("KQkq", (CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ))
+                           if position.castling & right) or '-'
+        ep_square = position.ep_square
+        ep = FILES[ep_square & 7] + str((ep_square >> 3) + 1) if ep_square is not None else '-'
+        return (f"{position.board_fen()} {self.current_turn} {castling} {ep} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def _position_changed(self):
+        self._view = None
+        self._moves_from = {}
+
+    @property
+    def key(self) -> int:
+        # Zobrist hash of the position including side to move, castling and en passant
+        if self.current_turn == 'b':
+            return self.position.hash ^ ZOBRIST_BLACK_TO_MOVE
+        return self.position.hash
+
+    @property
+    def board(self) -> List[List[Optional[Piece]]]:
+        # 8x8 view of the position, only rebuilt after the position changes
+        if self._view is None:
+            self._view = [[self.piece_at((row, col)) for col in range(8)] for row in range(8)]
+        return self._view
+
+    def piece_at(self, pos: Tuple[int, int]) -> Optional[Piece]:
+        occupant = self.position.squares[square_index(pos)]
+        if occupant is None:
+            return None
+        piece = self._pieces.get(occupant)
+        if piece is None:
+            color, name = occupant
+            piece = self._pieces[occupant] = PIECE_CLASSES[name](color)
+        return piece
 
     def find_king(self, color: str) -> Optional[Tuple[int, int]]:
-        for row_id, row in enumerate(self.board):
-            for col_id, piece in enumerate(row):
-                if piece and isinstance(piece, King) and piece.color == color:
-                    return row_id, col_id
-        return None
-
-    def move_piece(self, start_pos: Tuple[int, int], end_pos: Tuple[int, int], win) -> bool:
-        start_row, start_col = start_pos
-        end_row, end_col = end_pos
-        piece = self.board[start_row][start_col]
-        if piece and piece.valid_move(start_pos, end_pos, self.board):
-
-            if isinstance(piece, King) and abs(start_col - end_col) == 2:
-                if end_col == 6:
-                    self.board[start_row][5] = self.board[start_row][7]  # Move rook
-                    self.board[start_row][7] = None
-                elif end_col == 2:
-                    self.board[start_row][3] = self.board[start_row][0]  # Move rook
-                    self.board[start_row][0] = None
-
-            temp_piece = self.board[end_row][end_col]
-            self.board[end_row][end_col] = piece
-            self.board[start_row][start_col] = None
-
-            king_pos = self.find_king(self.current_turn)
-            if king_pos and is_checked(self.board, self.current_turn, king_pos):
-                self.board[start_row][start_col] = piece
-                self.board[end_row][end_col] = temp_piece
-                draw_message(win, "King is in Check")
-                return False
-
-            piece.moved = True
-            self.current_turn = 'b' if self.current_turn == 'w' else 'w'
-
-            return True
+        square = self.position.king_square(color)
+        return square_pos(square) if square is not None else None
+
+    @counted("legal_moves")
+    def legal_moves(self, color: Optional[str] = None) -> List[Move]:
+        # Generated once per position and color, then served from the cache; callers must not mutate it
+        color = color or self.current_turn
+        cache_key = (self.key, 'moves', color)
+        moves = POSITION_CACHE.get(cache_key)
+        if moves is None:
+            ep_square = self.position.ep_square if color == self.current_turn else None
+            moves = generate_legal_moves(self.position, color, ep_square)
+            POSITION_CACHE.put(cache_key, moves)
+        return moves
+
+    def legal_moves_from(self, pos: Tuple[int, int]) -> List[Move]:
+        square = square_index(pos)
+        moves = self._moves_from.get(square)
+        if moves is None:
+            occupant = self.position.squares[square]
+            if occupant is None:
+                return []
+            moves = [move for move in self.legal_moves(occupant[0]) if move.from_square == square]
+            self._moves_from[square] = moves
+        return moves
+
+    def move_piece(self, start_pos: Tuple[int, int], end_pos: Tuple[int, int], promotion: str = 'q') -> MoveStatus:
+        end = square_index(end_pos)
+        for move in self.legal_moves_from(start_pos):
+            if move.to_square == end and move.promotion in (None, promotion):
+                self.push(move)
+                return MoveStatus.OK
+
+        piece = self.piece_at(start_pos)
+        if piece and piece.valid_move(start_pos, end_pos, self.position):
+            return MoveStatus.IN_CHECK
+        return MoveStatus.INVALID
+
+    def parse_uci(self, uci: str) -> Move:
+        for move in self.legal_moves():
+            if move.uci() == uci:
+                return move
+        raise ValueError(f"Illegal move {uci!r} in {self.fen()}")
+
+    def push_uci(self, uci: str) -> Move:
+        move = self.parse_uci(uci)
+        self.push(move)
+        return move
+
+    def parse_san(self, san: str) -> Move:
+        text = san.rstrip("+#!?")
+        moves = self.legal_moves()
+        if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            king = self.position.kings[self.current_turn]
+            target = king + 2 if len(text) == 3 else king - 2
+            for move in moves:
+                if move.from_square == king and move.to_square == target:
+                    return move
+            raise ValueError(f"Illegal castling {san!r} in {self.fen()}")
+
+        match = SAN_PATTERN.match(text)
+        if not match:
+            raise ValueError(f"Invalid SAN {san!r}")
+        piece, from_file, from_rank, to_name, promotion = match.groups()
+        name = piece.lower() if piece else 'p'
+        to_square = FILES.index(to_name[0]) + (int(to_name[1]) - 1) * 8
+        promotion = promotion.lower() if promotion else None
+        squares = self.position.squares
+        candidates = [move for move in moves
+                      if move.to_square == to_square and move.promotion == promotion
+                      and squares[move.from_square][1] == name
+                      and (from_file is None or FILES[move.from_square & 7] == from_file)
+                      and (from_rank is None or str((move.from_square >> 3) + 1) == from_rank)]
+        if len(candidates) != 1:
+            problem = "Ambiguous" if candidates else "Illegal"
+            raise ValueError(f"{problem} move {san!r} in {self.fen()}")
+        return candidates[0]
+
+    def push_san(self, san: str) -> Move:
+        move = self.parse_san(san)
+        self.push(move)
+        return move
+
+    def san(self, move: Move) -> str:
+        squares = self.position.squares
+        start, end = move.from_square, move.to_square
+        name = squares[start][1]
+        to_name = FILES[end & 7] + str((end >> 3) + 1)
+        capture = squares[end] is not None or (name == 'p' and end == self.position.ep_square)
+
+        if name == 'k' and abs(start - end) == 2:
+            text = "O-O" if end > start else "O-O-O"
+        elif name == 'p':
+            text = (FILES[start & 7] + 'x' if capture else '') + to_name
+            if move.promotion:
+                text += '=' + move.promotion.upper()
         else:
-            draw_message(win, "Invalid Move")
-            return False
+            text = name.upper()
+            rivals = [other.from_square for other in self.legal_moves()
+                      if other.to_square == end and other.from_square != start and squares[other.from_square][1] == name]
+            if rivals:
+                if all(rival & 7 != start & 7 for rival in rivals):
+                    text += FILES[start & 7]
+                elif all(rival >> 3 != start >> 3 for rival in rivals):
+                    text += str((start >> 3) + 1)
+                else:
+                    text += FILES[start & 7] + str((start >> 3) + 1)
+            text += ('x' if capture else '') + to_name
 
+        self.push(move)
+        if self.is_check():
+            text += '#' if not self.legal_moves() else '+'
+        self.pop()
+        return text
+
+    @property
+    def move_stack(self) -> List[Move]:
+        return [record.move for record in self._stack]
+
+    def push(self, move: Move):
+        start, end = move.from_square, move.to_square
+        position = self.position
+        color, name = position.squares[start]
+        key = self.key  # Read before the capture below changes the hash
+        if name == 'p' and end == position.ep_square:
+            captured = position.remove(end - 8 if color == 'w' else end + 8)  # Capture en passant
+        else:
+            captured = position.remove(end)
+        self._stack.append(UndoRecord(move, captured, position.castling, position.ep_square, self.halfmove_clock,
+                                      key))
+
+        position.move(start, end)
+        if move.promotion:
+            position.remove(end)
+            position.put(end, color, move.promotion)
+        elif name == 'k' and abs(start - end) == 2:
+            if end > start:
+                position.move(start + 3, start + 1)  # Move rook
+            else:
+                position.move(start - 4, start - 1)  # Move rook
+        position.set_castling(position.castling & CASTLING_KEEP[start] & CASTLING_KEEP[end])
+        enemy = 'b' if color == 'w' else 'w'
+        ep_square = None
+        if name == 'p' and abs(start - end) == 16:
+            # Only record en passant when a pawn can actually take, so repeated positions hash alike
+            ep_square = (start + end) // 2
+            if not PAWN_ATTACKS[color][ep_square] & position.pieces[enemy]['p']:
+                ep_square = None
+        position.set_ep_square(ep_square)
+
+        self.halfmove_clock = 0 if name == 'p' or captured else self.halfmove_clock + 1
+        if color == 'b':
+            self.fullmove_number += 1
+        self.current_turn = enemy
+        self._position_changed()
+
+    def pop(self) -> Move:
+        record = self._stack.pop()
+        move = record.move
+        start, end = move.from_square, move.to_square
+        position = self.position
+        color = 'b' if self.current_turn == 'w' else 'w'
+
+        position.move(end, start)
+        if move.promotion:
+            position.remove(start)
+            position.put(start, color, 'p')
+        name = position.squares[start][1]
+        if name == 'p' and end == record.ep_square:
+            position.put(end - 8 if color == 'w' else end + 8, *record.captured)
+        elif record.captured:
+            position.put(end, *record.captured)
+        elif name == 'k' and abs(start - end) == 2:
+            if end > start:
+                position.move(start + 1, start + 3)  # Move rook back
+            else:
+                position.move(start - 1, start - 4)  # Move rook back
+        position.set_castling(record.castling)
+        position.set_ep_square(record.ep_square)
+
+        self.halfmove_clock = record.halfmove_clock
+        if color == 'b':
+            self.fullmove_number -= 1
+        self.current_turn = color
+        self._position_changed()
+        return move
+
+    @counted("is_check")
+    def is_check(self) -> bool:
+        king = self.position.kings[self.current_turn]
+        enemy = 'b' if self.current_turn == 'w' else 'w'
+        return king is not None and bool(self.position.attackers_to(king, enemy))
+
+    @timed("is_checkmate")
     def is_checkmate(self, color: str) -> bool:
-        king_pos = self.find_king(color)
-        if not king_pos:
-            return False
-        if not is_checked(self.board, color, king_pos):
-            return False
-
-
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece and piece.color == color:
-                    for r in range(8):
-                        for c in range(8):
-                            if piece.valid_move((row, col), (r, c), self.board):
-                                temp_piece = self.board[r][c]
-                                self.board[r][c] = piece
-                                self.board[row][col] = None
-
-                                new_king_pos = king_pos
-                                if isinstance(piece, King):
-                                    new_king_pos = (r, c)
-
-                                if not is_checked(self.board, color, new_king_pos):
-                                    self.board[row][col] = piece
-                                    self.board[r][c] = temp_piece
-                                    return False
-
-                                self.board[row][col] = piece
-                                self.board[r][c] = temp_piece
-        return True
+        cache_key = (self.key, 'mate', color)
+        mate = POSITION_CACHE.get(cache_key)
+        if mate is None:
+            king_pos = self.find_king(color)
+            mate = bool(king_pos) and is_checked(self.position, color, king_pos) and not self.legal_moves(color)
+            POSITION_CACHE.put(cache_key, mate)
+        return mate
+
+    def is_repetition(self, count: int = 3) -> bool:
+        # Only positions since the last capture or pawn move can repeat, and only with the same side to move
+        key = self.key
+        seen = 1
+        stack = self._stack
+        oldest = max(len(stack) - self.halfmove_clock, 0)
+        for index in range(len(stack) - 2, oldest - 1, -2):
+            if stack[index].key == key:
+                seen += 1
+                if seen >= count:
+                    return True
+        return False
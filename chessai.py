@@ -1,27 +1,175 @@
 # chessai.py
 
 import chess.engine
+import chess.polyglot
 import os
+import random
+from analysis_cache import AnalysisCache
+from cache import LRUCache
+from instrumentation import timed
+from search import NativeAI
+
+
+STOCKFISH_PATH = os.environ.get(
+    "STOCKFISH_PATH", "./ChessEngine/stockfish-windows-x86-64-avx2/stockfish/stockfish-windows-x86-64-avx2.exe")
+# "stockfish", "native", or "auto" to use Stockfish when its executable is present
+AI_BACKEND = os.environ.get("CHESS_AI_BACKEND", "auto")
+# Polyglot opening book; ChessAI plays without one if the file is missing
+BOOK_PATH = os.environ.get("CHESS_BOOK_PATH", "./ChessEngine/book.bin")
+BOOK_DEPTH = 16
+# SQLite file of previously searched positions shared by every process on the machine; unset disables it
+ANALYSIS_CACHE_PATH = os.environ.get("CHESS_ANALYSIS_CACHE")
+# Fixed search depth or node count per move in place of the time limit; unset searches by time
+AI_DEPTH = int(os.environ["CHESS_AI_DEPTH"]) if os.environ.get("CHESS_AI_DEPTH") else None
+AI_NODES = int(os.environ["CHESS_AI_NODES"]) if os.environ.get("CHESS_AI_NODES") else None
+
+
+def open_engine(stockfish_path=STOCKFISH_PATH, options=None):
+    if not os.path.exists(stockfish_path):
+        raise FileNotFoundError(f"Stockfish executable not found at path: {stockfish_path}")
+
+    try:
+        engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
+    except PermissionError as e:
+        raise PermissionError(f"Permission denied when trying to open Stockfish engine at path: {stockfish_path}. "
+                              f"Please check the file permissions and try again. Original error: {e}")
+    except Exception as e:
+        raise Exception(f"An error occurred while trying to open Stockfish engine: {e}")
+
+    if options:
+        engine.configure(options)
+    return engine
+
+
+def _physical_memory_mb():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None  # Not available on Windows
+
+
+def engine_options(threads=None, hash_mb=None, instances=1):
+    # Split the machine between `instances` engines, leaving one core for the GUI or caller.
+    # Hash gets about 1/32 of physical memory, rounded down to a power of two.
+    if threads is None:
+        threads = max(1, ((os.cpu_count() or 1) - 1) // instances)
+    if hash_mb is None:
+        memory_mb = _physical_memory_mb()
+        hash_mb = min(max((memory_mb or 512) // 32 // instances, 16), 2048)
+        hash_mb = 1 << (hash_mb.bit_length() - 1)
+    return {"Threads": threads, "Hash": hash_mb}
+
+
+class OpeningBook:
+    # python-chess memory-maps the book and binary-searches it by Zobrist key, so a lookup
+    # touches only a few pages of the file
+    def __init__(self, path=BOOK_PATH, max_ply=BOOK_DEPTH, seed=None):
+        self.path = path
+        self.max_ply = max_ply
+        self.random = random.Random(seed)
+        self.hits = 0
+        self.misses = 0
+        self._reader = chess.polyglot.open_reader(path)
+
+    def choose(self, board):
+        if board.ply() >= self.max_ply:
+            return None
+        try:
+            move = self._reader.weighted_choice(board, random=self.random).move
+        except IndexError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return move
+
+    def close(self):
+        self._reader.close()
+
+
+def open_book(path=BOOK_PATH, max_ply=BOOK_DEPTH, seed=None):
+    if not path or not os.path.exists(path):
+        return None
+    return OpeningBook(path, max_ply, seed)
+
+
 class ChessAI:
-    def __init__(self, difficulty):
+    def __init__(self, difficulty, cache_size=10_000, book_path=BOOK_PATH, book_depth=BOOK_DEPTH,
+                 analysis_cache=ANALYSIS_CACHE_PATH, depth=None, nodes=None, clock=None, threads=None,
+                 hash_mb=None, instances=1):
         self.difficulty = difficulty
-        stockfish_path = "./ChessEngine/stockfish-windows-x86-64-avx2/stockfish/stockfish-windows-x86-64-avx2.exe"
+        # Depth or node limits replace the time limit and give the same answer regardless of load
+        if depth or nodes:
+            self.limit = chess.engine.Limit(depth=depth, nodes=nodes)
+        else:
+            self.limit = chess.engine.Limit(time=0.1 * difficulty)
+        self.clock = clock
+        self.cache = LRUCache(maxsize=cache_size)
+        self.book = open_book(book_path, book_depth)
+        if isinstance(analysis_cache, str):
+            analysis_cache = AnalysisCache(analysis_cache)
+        self.analysis_cache = analysis_cache
+        self.engine = open_engine(options=engine_options(threads, hash_mb, instances))
 
-        if not os.path.exists(stockfish_path):
-            raise FileNotFoundError(f"Stockfish executable not found at path: {stockfish_path}")
+    def search_limit(self, board):
+        if self.clock is None or self.limit.time is None:
+            return self.limit
+        return chess.engine.Limit(time=self.clock.budget('w' if board.turn else 'b', board.fullmove_number))
 
-        try:
-            self.engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
-        except PermissionError as e:
-            raise PermissionError(f"Permission denied when trying to open Stockfish engine at path: {stockfish_path}. "
-                                  f"Please check the file permissions and try again. Original error: {e}")
-        except Exception as e:
-            raise Exception(f"An error occurred while trying to open Stockfish engine: {e}")
-
-    def get_best_move(self, board_fen):
+    def get_best_move(self, board_fen, ponder=False):
         board = chess.Board(board_fen)
-        result = self.engine.play(board, chess.engine.Limit(time=0.1 * self.difficulty))
-        return result.move
+        moves = list(board.legal_moves)
+        if len(moves) == 1:
+            return moves[0]  # Forced reply, nothing to think about
+        if self.book is not None:
+            move = self.book.choose(board)
+            if move is not None:
+                return move
+        key = (chess.polyglot.zobrist_hash(board), self.difficulty)
+        move = self.cache.get(key)
+        if move is None:
+            stored = self.analysis_cache.get(board_fen, self.limit) if self.analysis_cache is not None else None
+            if stored is not None:
+                move = chess.Move.from_uci(stored)
+            else:
+                limit = self.search_limit(board)
+                move = (self._timed_ponder if ponder else self._timed_search)(board, limit)
+                if move is None:
+                    return None  # Mate or stalemate: nothing to play, nothing worth remembering
+                # Clock-budgeted searches vary in strength, so only the configured limit is persisted
+                if self.analysis_cache is not None and limit is self.limit:
+                    self.analysis_cache.put(board_fen, self.limit, move.uci())
+            self.cache.put(key, move)
+        return move
+
+    def _search(self, board, limit):
+        return self.engine.play(board, limit).move
+
+    # Only real searches are timed, and speculative ponder searches apart from requested ones;
+    # book moves and cache hits are counted by the book and caches themselves
+    _timed_search = timed("engine")(_search)
+    _timed_ponder = timed("ponder")(_search)
 
     def close(self):
+        if self.book is not None:
+            self.book.close()
+        if self.analysis_cache is not None:
+            self.analysis_cache.close()
         self.engine.quit()
+
+
+def create_ai(difficulty, backend=None, clock=None, threads=None, hash_mb=None, instances=1, cache_size=10_000,
+              book_path=BOOK_PATH, analysis_cache=ANALYSIS_CACHE_PATH, depth=AI_DEPTH, nodes=AI_NODES):
+    # threads/hash_mb/instances size Stockfish; pass instances when several engines share the machine.
+    # The book and analysis cache only apply to Stockfish; None plays without them.
+    # depth or nodes replace the time limit and the clock for either backend.
+    backend = backend or AI_BACKEND
+    if backend == "auto":
+        backend = "stockfish" if os.path.exists(STOCKFISH_PATH) else "native"
+    if backend == "stockfish":
+        return ChessAI(difficulty, cache_size=cache_size, book_path=book_path, analysis_cache=analysis_cache,
+                       depth=depth, nodes=nodes, clock=clock, threads=threads, hash_mb=hash_mb, instances=instances)
+    if backend == "native":
+        if depth or nodes:
+            return NativeAI(difficulty, move_time=0, max_depth=depth, max_nodes=nodes, cache_size=cache_size)
+        return NativeAI(difficulty, clock=clock, cache_size=cache_size)
+    raise ValueError(f"Unknown AI backend: {backend}")
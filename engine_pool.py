@@ -0,0 +1,163 @@
+# engine_pool.py
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import chess
+import chess.engine
+
+from chessai import STOCKFISH_PATH, engine_options, open_engine
+from parallel import bounded_results
+
+PositionRequest = Union[str, Tuple[str, chess.engine.Limit]]
+
+
+class AnalysisResult(NamedTuple):
+    fen: str
+    info: Optional[dict]
+    error: Optional[Exception] = None
+
+
+class EnginePool:
+    # Each engine is its own UCI process; the threads here only wait on their pipes.
+    def __init__(self, size: Optional[int] = None, threads: int = 1, hash_mb: Optional[int] = None,
+                 stockfish_path: str = STOCKFISH_PATH, options: Optional[dict] = None,
+                 limit: Optional[chess.engine.Limit] = None, search_timeout: Optional[float] = 60.0):
+        self.size = size or max(1, (os.cpu_count() or 1) // threads)
+        self.stockfish_path = stockfish_path
+        self.options = {**engine_options(threads, hash_mb, self.size), **(options or {})}
+        self.limit = limit or chess.engine.Limit(depth=12)
+        self.search_timeout = search_timeout
+        self.restarts = 0
+        self._idle: "queue.Queue[chess.engine.SimpleEngine]" = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(open_engine(self.stockfish_path, self.options))
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="engine-pool")
+
+    @staticmethod
+    def _stop(engine: chess.engine.SimpleEngine):
+        try:
+            engine.quit()
+        except (chess.engine.EngineTerminatedError, chess.engine.EngineError, TimeoutError):
+            engine.close()
+
+    def _restart(self, engine: chess.engine.SimpleEngine, hung: bool = False) -> chess.engine.SimpleEngine:
+        if hung:
+            engine.close()  # A hung engine won't answer quit, so kill it outright
+        else:
+            self._stop(engine)
+        self.restarts += 1
+        return open_engine(self.stockfish_path, self.options)
+
+    def _search(self, engine: chess.engine.SimpleEngine, board: chess.Board,
+                limit: chess.engine.Limit) -> dict:
+        # python-chess waits forever on an engine that never answers "go", and its own timeout can't
+        # cancel the search either. A watchdog kills the process instead, which fails the pending call.
+        if not self.search_timeout:
+            return engine.analyse(board, limit)
+        expired = threading.Event()
+
+        def kill():
+            expired.set()
+            engine.close()
+
+        watchdog = threading.Timer((limit.time or 0) + self.search_timeout, kill)
+        watchdog.start()
+        try:
+            return engine.analyse(board, limit)
+        except chess.engine.EngineTerminatedError:
+            if expired.is_set():
+                raise TimeoutError(f"Engine did not answer within {self.search_timeout}s") from None
+            raise
+        finally:
+            watchdog.cancel()
+
+    def analyse(self, fen: str, limit: Optional[chess.engine.Limit] = None) -> AnalysisResult:
+        board = chess.Board(fen)
+        limit = limit or self.limit
+        engine = self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    return AnalysisResult(fen, self._search(engine, board, limit))
+                except (chess.engine.EngineTerminatedError, chess.engine.EngineError, TimeoutError) as e:
+                    # The engine process died or hung; replace it and give the position one more try.
+                    # A replacement is started even after the last attempt so the pool never keeps a broken engine.
+                    engine = self._restart(engine, hung=isinstance(e, TimeoutError))
+                    if attempt:
+                        raise
+        finally:
+            self._idle.put(engine)
+
+    def _analyse_safely(self, fen: str, limit: Optional[chess.engine.Limit]) -> AnalysisResult:
+        try:
+            return self.analyse(fen, limit)
+        except Exception as e:
+            return AnalysisResult(fen, None, e)
+
+    def analyse_many(self, positions: Iterable[PositionRequest]) -> Iterator[AnalysisResult]:
+        # Results come back in completion order. At most two positions per engine are in flight,
+        # so arbitrarily long streams are analysed with bounded memory.
+        def submit(request: PositionRequest):
+            fen, limit = (request, None) if isinstance(request, str) else request
+            return self._executor.submit(self._analyse_safely, fen, limit)
+
+        return bounded_results(submit, positions, 2 * self.size)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        while not self._idle.empty():
+            self._stop(self._idle.get())
+
+    def __enter__(self) -> 'EnginePool':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse a file of FENs (one per line) across several engines.")
+    parser.add_argument("fens", nargs="?", help="input file (default: stdin)")
+    parser.add_argument("--engines", type=int, help="number of engine processes (default: one per core)")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--hash", type=int, help="hash size per engine in MB (default: share of physical memory)")
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--stockfish", default=STOCKFISH_PATH)
+    args = parser.parse_args(argv)
+
+    source = open(args.fens) if args.fens else sys.stdin
+    fens = (line.strip() for line in source if line.strip())
+    count = failures = 0
+    start = time.perf_counter()
+    with EnginePool(args.engines, args.threads, args.hash, args.stockfish,
+                    limit=chess.engine.Limit(depth=args.depth)) as pool:
+        for result in pool.analyse_many(fens):
+            count += 1
+            if result.error:
+                failures += 1
+                print(json.dumps({"fen": result.fen, "error": str(result.error)}))
+                continue
+            pv = result.info.get("pv") or []
+            score = result.info.get("score")
+            print(json.dumps({
+                "fen": result.fen,
+                "bestmove": pv[0].uci() if pv else None,
+                "score": score.white().score(mate_score=100_000) if score else None,
+                "depth": result.info.get("depth"),
+            }))
+    elapsed = time.perf_counter() - start
+    print(f"{count} positions ({failures} failed) in {elapsed:.1f}s, {pool.restarts} engine restarts",
+          file=sys.stderr)
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
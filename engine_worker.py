@@ -0,0 +1,78 @@
+# engine_worker.py
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+import chess
+
+
+class EngineWorker:
+    # Runs ChessAI searches on a background thread so the GUI loop never blocks on the engine.
+    # All engine calls happen on the single worker thread, so the wrapped ChessAI needs no locking.
+    def __init__(self, ai, ponder: bool = False):
+        self.ai = ai
+        # Pondering only pays off when the engine keeps its answers
+        self.ponder_enabled = ponder and getattr(ai, "cache", None) is not None
+        # Engines that expose a stop event can abandon a ponder search when a real request arrives
+        self._stop_event = getattr(ai, "stop_event", None)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="engine")
+        self._pending: List[Future] = []
+        self._ponder: Optional[Future] = None
+
+    def request_move(self, board_fen: str) -> Future:
+        self._cancel_ponder()
+        future = self._executor.submit(self._best_move, board_fen)
+        self._track(future)
+        return future
+
+    def ponder(self, board_fen: str) -> Optional[Future]:
+        # Guess the opponent's reply and search the resulting position while they think.
+        # The answer lands in the engine's move cache, so a correct guess makes the next request instant.
+        if not self.ponder_enabled:
+            return None
+        self._cancel_ponder()
+        self._ponder = self._executor.submit(self._ponder_search, board_fen)
+        self._track(self._ponder)
+        return self._ponder
+
+    def _best_move(self, board_fen: str):
+        # Runs on the worker thread after any ponder search has returned, so clearing here can't race it
+        if self._stop_event is not None:
+            self._stop_event.clear()
+        return self.ai.get_best_move(board_fen)
+
+    def _stopped(self) -> bool:
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    def _ponder_search(self, board_fen: str):
+        board = chess.Board(board_fen)
+        if board.is_game_over() or self._stopped():
+            return None
+        board.push_uci(self.ai.get_best_move(board_fen, ponder=True).uci())
+        if board.is_game_over() or self._stopped():
+            return None
+        return self.ai.get_best_move(board.fen(), ponder=True)
+
+    def _cancel_ponder(self):
+        if self._ponder is not None:
+            if not self._ponder.cancel() and self._stop_event is not None:
+                self._stop_event.set()  # Already running: end the search at its next budget check
+            self._ponder = None
+
+    def _track(self, future: Future):
+        self._pending = [pending for pending in self._pending if not pending.done()]
+        self._pending.append(future)
+
+    def cancel(self):
+        # Drop queued searches, e.g. when the game restarts. A search already running is stopped early
+        # if the engine supports it, otherwise it finishes in the background and is never read.
+        for future in self._pending:
+            future.cancel()
+        if self._stop_event is not None and any(future.running() for future in self._pending):
+            self._stop_event.set()
+        self._pending = []
+        self._ponder = None
+
+    def close(self):
+        self.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,152 @@
+# instrumentation.py
+
+import atexit
+import cProfile
+import csv
+import functools
+import json
+import os
+import pstats
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional
+
+# Read once at import: with metrics off, timed() and counted() hand back the undecorated function,
+# so instrumented hot paths cost nothing at all
+ENABLED = os.environ.get("CHESS_METRICS", "") not in ("", "0")
+EXPORT_PATH = os.environ.get("CHESS_METRICS_OUT")
+PROFILE_PATH = os.environ.get("CHESS_PROFILE")
+
+# Bucket upper bounds in seconds, doubling from 1 microsecond to about 17 seconds
+BUCKETS = [1e-6 * 2 ** i for i in range(25)]
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the requested rank, so accurate to within a factor of two
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+        return 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.timers: Dict[str, Histogram] = {}
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float):
+        histogram = self.timers.get(name)
+        if histogram is None:
+            histogram = self.timers[name] = Histogram()
+        histogram.observe(seconds)
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "timers": {
+                name: {"count": histogram.count, "total": histogram.total, "mean": histogram.mean,
+                       "p50": histogram.percentile(0.5), "p90": histogram.percentile(0.9),
+                       "p99": histogram.percentile(0.99), "max": histogram.max}
+                for name, histogram in self.timers.items()
+            },
+        }
+
+    def summary_lines(self) -> List[str]:
+        lines = [f"{name}: {histogram.count} x {histogram.mean * 1000:.2f}ms p99 {histogram.percentile(0.99) * 1000:.2f}ms"
+                 for name, histogram in sorted(self.timers.items())]
+        lines += [f"{name}: {value}" for name, value in sorted(self.counters.items())]
+        return lines
+
+    def export(self, path: str):
+        # JSON unless the file name ends in .csv
+        snapshot = self.snapshot()
+        if path.endswith(".csv"):
+            fields = ["count", "total", "mean", "p50", "p90", "p99", "max"]
+            with open(path, "w", newline="") as handle:
+                writer = csv.writer(handle)
+                writer.writerow(["name", "kind"] + fields)
+                for name, stats in snapshot["timers"].items():
+                    writer.writerow([name, "timer"] + [stats[field] for field in fields])
+                for name, value in snapshot["counters"].items():
+                    writer.writerow([name, "counter", value] + [""] * (len(fields) - 1))
+        else:
+            with open(path, "w") as handle:
+                json.dump(snapshot, handle, indent=2)
+
+
+metrics = Metrics()
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    # Records call count and latency for the decorated function under `name`
+    def decorate(func: Callable) -> Callable:
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def counted(name: str) -> Callable[[Callable], Callable]:
+    # Counts calls to the decorated function under `name`, for paths too hot or too cheap to time
+    def decorate(func: Callable) -> Callable:
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics.count(name)
+            return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def run_profiled(func: Callable, *args, path: Optional[str] = PROFILE_PATH, **kwargs):
+    # Runs func under cProfile when a dump path is configured and prints the top entries on exit
+    if not path:
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(path)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if ENABLED and EXPORT_PATH:
+    atexit.register(metrics.export, EXPORT_PATH)
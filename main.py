@@ -1,38 +1,29 @@
 # main.py
 
+import time
+
 import pygame
 from board import Board
-from chessai import ChessAI
-from move import get_square_under_mouse
-from utils import draw_message, board_to_fen
-from pieces import King, is_checked
-
-def display_possible_moves(win, possible_moves):
-    for move in possible_moves:
-        row, col = move
-        pygame.draw.circle(win, (0, 255, 0), (col * 80 + 40, row * 80 + 40), 10)
-
+from bitboard import square_pos
+from chessai import create_ai
+from engine_worker import EngineWorker
+from instrumentation import ENABLED as METRICS_ENABLED, metrics, run_profiled, timed
+from renderer import BoardRenderer, MessageOverlay, MetricsOverlay, get_square_under_mouse
+from sprites import load_sprites
+
+def wait_for_input(timeout_ms):
+    # Sleep until the next event instead of spinning the frame loop over a static scene
+    event = pygame.event.wait(timeout_ms)
+    if event.type != pygame.NOEVENT:
+        pygame.event.post(event)
+
+@timed("possible_moves")
 def get_possible_moves(piece, pos, board):
     possible_moves = []
-    for row in range(8):
-        for col in range(8):
-            if piece.valid_move(pos, (row, col), board.board):
-                temp_piece = board.board[row][col]
-                board.board[row][col] = piece
-                board.board[pos[0]][pos[1]] = None
-
-                king_pos = None
-                for r in range(8):
-                    for c in range(8):
-                        if isinstance(board.board[r][c], King) and board.board[r][c].color == piece.color:
-                            king_pos = (r, c)
-                            break
-
-                if king_pos and not is_checked(board.board, piece.color, king_pos):
-                    possible_moves.append((row, col))
-
-                board.board[pos[0]][pos[1]] = piece
-                board.board[row][col] = temp_piece
+    for move in board.legal_moves_from(pos):
+        target = square_pos(move.to_square)
+        if target not in possible_moves:  # Promotions share a target square
+            possible_moves.append(target)
 
     return possible_moves
 
@@ -43,28 +34,43 @@ def main():
     pygame.init()
     win = pygame.display.set_mode((640, 640))
     pygame.display.set_caption("Chess")
+    load_sprites()
+    renderer = BoardRenderer(win)
+    overlay = MessageOverlay()
+    stats_overlay = MetricsOverlay(metrics)
     clock = pygame.time.Clock()
 
     board = Board()
     try:
-        ai = ChessAI(difficulty=2)
+        ai = create_ai(difficulty=2)
     except Exception as e:
         print(f"Failed to initialize ChessAI: {e}")
         return
+    worker = EngineWorker(ai, ponder=True)
+    pending_move = None
 
     selected_piece = None
     possible_moves = []
     run = True
     ai_color = 'b'
+    restart_at = None
 
     while run:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
 
+            if event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and METRICS_ENABLED:
+                cleared = stats_overlay.toggle()
+                if cleared:
+                    renderer.invalidate_rect(cleared)
+
             if event.type == pygame.MOUSEBUTTONDOWN:
                 piece, pos = get_square_under_mouse(board.board)
-                if piece and piece.color == board.current_turn and piece.color != ai_color:
+                if piece and piece.color == board.current_turn and piece.color != ai_color and restart_at is None:
                     selected_piece = pos
                     possible_moves = get_possible_moves(piece, pos, board)
 
@@ -72,43 +78,67 @@ def main():
                 if selected_piece:
                     piece, new_pos = get_square_under_mouse(board.board)
                     if new_pos and new_pos != selected_piece:
-                        if board.move_piece(selected_piece, new_pos, win):
-                            board.draw(win)
+                        status = board.move_piece(selected_piece, new_pos)
+                        if status:
                             selected_piece = None
                             possible_moves = []
 
                             if board.is_checkmate('b'):
-                                draw_message(win, "Checkmate, white wins!", 3)  # Display message for 3 seconds
-                                pygame.display.flip()
-                                pygame.time.delay(3000)  # Wait for 3 seconds
-                                board = restart_game()
-                                selected_piece = None
-                                possible_moves = []
-
-        if board.current_turn == ai_color:
-            board_fen = board_to_fen(board.board, board.current_turn)
-            best_move = ai.get_best_move(board_fen)
+                                overlay.show("Checkmate, white wins!", 3, transient=False)  # Display message for 3 seconds
+                                restart_at = pygame.time.get_ticks() + 3000
+                        else:
+                            overlay.show(status.value)
+
+        now = pygame.time.get_ticks()
+        if restart_at is not None and now >= restart_at:
+            worker.cancel()
+            board = restart_game()
+            selected_piece = None
+            possible_moves = []
+            restart_at = None
+
+        if board.current_turn == ai_color and pending_move is None and restart_at is None:
+            # Search in the background and keep drawing until the move is ready
+            pending_move = worker.request_move(board.fen())
+
+        if pending_move is not None and pending_move.done():
+            best_move = pending_move.result()
+            pending_move = None
             start_pos = (7 - int(best_move.from_square / 8), best_move.from_square % 8)
             end_pos = (7 - int(best_move.to_square / 8), best_move.to_square % 8)
-            if board.move_piece(start_pos, end_pos, win):
-                board.draw(win)
-
+            promotion = best_move.uci()[4:] or 'q'
+            status = board.move_piece(start_pos, end_pos, promotion)
+            if status:
                 if board.is_checkmate('w'):
-                    draw_message(win, "Checkmate, black wins!", 3)  # Display message for 3 seconds
-                    pygame.display.flip()
-                    pygame.time.delay(3000)  # Wait for 3 seconds
-                    board = restart_game()
-                    selected_piece = None
-                    possible_moves = []
-
-        board.draw(win)
-        if selected_piece:
-            display_possible_moves(win, possible_moves)
-        pygame.display.flip()
-        clock.tick(60)
-
+                    overlay.show("Checkmate, black wins!", 3, transient=False)  # Display message for 3 seconds
+                    restart_at = now + 3000
+                else:
+                    worker.ponder(board.fen())
+            else:
+                overlay.show(status.value)
+
+        frame_start = time.perf_counter()
+        cleared = overlay.update(win, now)
+        if cleared:
+            renderer.invalidate_rect(cleared)
+        cleared = stats_overlay.update(now)
+        if cleared:
+            renderer.invalidate_rect(cleared)
+        highlights = possible_moves if selected_piece else ()
+        rects = renderer.render(board, highlights)
+        rects += overlay.draw(win, rects)
+        rects += stats_overlay.draw(win, rects)
+        drew = renderer.present(rects)
+        if METRICS_ENABLED and drew:
+            metrics.observe("frame", time.perf_counter() - frame_start)
+        if drew or pending_move is not None or overlay.active or restart_at is not None:
+            clock.tick(60)
+        else:
+            wait_for_input(250)
+
+    worker.close()
     ai.close()
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
+    run_profiled(main)
@@ -1,15 +1,16 @@
 # move.py
 
-import pygame
-from typing import Optional, Tuple, List
-from pieces import Piece
+from typing import NamedTuple, Optional
 
+FILES = "abcdefgh"
 
-def get_square_under_mouse(board: List[List[Optional[Piece]]]) -> Tuple[Optional[Piece], Tuple[int, int]]:
-    mouse_pos = pygame.mouse.get_pos()
-    col, row = mouse_pos[0] // 80, mouse_pos[1] // 80
-    if 0 <= col < 8 and 0 <= row < 8:
-        return board[row][col], (row, col)
-    return None, (0, 0)
 
+class Move(NamedTuple):
+    from_square: int
+    to_square: int
+    promotion: Optional[str] = None
 
+    def uci(self) -> str:
+        from_name = FILES[self.from_square & 7] + str((self.from_square >> 3) + 1)
+        to_name = FILES[self.to_square & 7] + str((self.to_square >> 3) + 1)
+        return from_name + to_name + (self.promotion or '')
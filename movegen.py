@@ -0,0 +1,133 @@
+# movegen.py
+
+from typing import List, Optional
+
+from bitboard import (Position, iter_squares, rook_attacks, bishop_attacks, queen_attacks,
+                      KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BETWEEN, BB_ALL,
+                      CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ)
+from instrumentation import timed
+from move import Move
+
+PROMOTIONS = ('q', 'r', 'b', 'n')
+
+# Every move is built once and shared, so cached move lists hold references rather than fresh tuples
+MOVES = [Move(index >> 6, index & 63) for index in range(64 * 64)]
+PROMOTION_MOVES = {(start, end): [Move(start, end, name) for name in PROMOTIONS]
+                   for start in range(64) for end in range(64)
+                   if (start >> 3, end >> 3) in ((6, 7), (1, 0)) and abs((start & 7) - (end & 7)) <= 1}
+
+
+def _add_pawn_move(moves: List[Move], start: int, end: int):
+    if end >= 56 or end < 8:
+        moves.extend(PROMOTION_MOVES[start, end])
+    else:
+        moves.append(MOVES[start << 6 | end])
+
+
+def _pinned(position: Position, color: str, enemy: str, king: int) -> dict:
+    # Maps each pinned piece to the squares it may still move to
+    pins = {}
+    own = position.occupancy[color]
+    enemy_pieces = position.pieces[enemy]
+    queens = enemy_pieces['q']
+    snipers = ((rook_attacks(king, position.occupancy[enemy]) & (enemy_pieces['r'] | queens))
+               | (bishop_attacks(king, position.occupancy[enemy]) & (enemy_pieces['b'] | queens)))
+    for sniper in iter_squares(snipers):
+        between = BETWEEN[king][sniper]
+        blockers = between & position.occupied
+        if blockers and blockers & (blockers - 1) == 0 and blockers & own:
+            pins[blockers.bit_length() - 1] = between | (1 << sniper)
+    return pins
+
+
+def _ep_exposes_king(position: Position, color: str, enemy: str, king: int, start: int, end: int,
+                     captured: int) -> bool:
+    occupied = (position.occupied & ~(1 << start) & ~(1 << captured)) | (1 << end)
+    enemy_pieces = position.pieces[enemy]
+    queens = enemy_pieces['q']
+    return bool((rook_attacks(king, occupied) & (enemy_pieces['r'] | queens))
+                | (bishop_attacks(king, occupied) & (enemy_pieces['b'] | queens)))
+
+
+@timed("movegen")
+def generate_legal_moves(position: Position, color: str, ep_square: Optional[int] = None) -> List[Move]:
+    enemy = 'b' if color == 'w' else 'w'
+    pieces = position.pieces[color]
+    own = position.occupancy[color]
+    enemy_occupancy = position.occupancy[enemy]
+    occupied = position.occupied
+    moves: List[Move] = []
+
+    king = position.king_square(color)
+    if king is None:
+        return moves
+
+    checkers = position.attackers_to(king, enemy)
+    enemy_attacks = position.attack_map(enemy)
+
+    # King moves; when in check, re-test with the king lifted so it can't hide behind itself
+    without_king = occupied & ~(1 << king)
+    for end in iter_squares(KING_ATTACKS[king] & ~own & ~enemy_attacks):
+        if not checkers or not position.attackers_to(end, enemy, without_king):
+            moves.append(MOVES[king << 6 | end])
+
+    if checkers & (checkers - 1):
+        return moves  # Double check, only the king can move
+
+    if checkers:
+        checker = checkers.bit_length() - 1
+        targets = BETWEEN[king][checker] | checkers
+    else:
+        targets = BB_ALL
+    pins = _pinned(position, color, enemy, king)
+
+    for name in ('n', 'b', 'r', 'q'):
+        for start in iter_squares(pieces[name]):
+            if name == 'n':
+                attacks = KNIGHT_ATTACKS[start]
+            elif name == 'b':
+                attacks = bishop_attacks(start, occupied)
+            elif name == 'r':
+                attacks = rook_attacks(start, occupied)
+            else:
+                attacks = queen_attacks(start, occupied)
+            attacks &= ~own & targets & pins.get(start, BB_ALL)
+            for end in iter_squares(attacks):
+                moves.append(MOVES[start << 6 | end])
+
+    step = 8 if color == 'w' else -8
+    start_rank = 1 if color == 'w' else 6
+    for start in iter_squares(pieces['p']):
+        allowed = targets & pins.get(start, BB_ALL)
+        push = start + step
+        if not occupied & (1 << push):
+            if allowed & (1 << push):
+                _add_pawn_move(moves, start, push)
+            double = push + step
+            if start >> 3 == start_rank and not occupied & (1 << double) and allowed & (1 << double):
+                moves.append(MOVES[start << 6 | double])
+        for end in iter_squares(PAWN_ATTACKS[color][start] & enemy_occupancy & allowed):
+            _add_pawn_move(moves, start, end)
+        if ep_square is not None and PAWN_ATTACKS[color][start] & (1 << ep_square):
+            captured = ep_square - step
+            # The captured pawn may itself be the checker
+            if (targets & (1 << ep_square) or checkers & (1 << captured)) and \
+                    pins.get(start, BB_ALL) & (1 << ep_square) and \
+                    not _ep_exposes_king(position, color, enemy, king, start, ep_square, captured):
+                moves.append(MOVES[start << 6 | ep_square])
+
+    if not checkers and position.castling:
+        if color == 'w':
+            king_side, queen_side = CASTLE_WK, CASTLE_WQ
+        else:
+            king_side, queen_side = CASTLE_BK, CASTLE_BQ
+        if position.castling & king_side and position.squares[king + 3] == (color, 'r') and \
+                not occupied & (0b11 << (king + 1)) and \
+                not enemy_attacks & (0b11 << (king + 1)):
+            moves.append(MOVES[king << 6 | (king + 2)])
+        if position.castling & queen_side and position.squares[king - 4] == (color, 'r') and \
+                not occupied & (0b111 << (king - 3)) and \
+                not enemy_attacks & (0b11 << (king - 2)):
+            moves.append(MOVES[king << 6 | (king - 2)])
+
+    return moves
@@ -0,0 +1,26 @@
+# parallel.py
+
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def worker_count(workers: Optional[int] = None) -> int:
+    return workers or os.cpu_count() or 1
+
+
+def bounded_results(submit: Callable[[T], Future], items: Iterable[T], max_in_flight: int) -> Iterator[Any]:
+    # Submits items lazily, keeping at most max_in_flight futures outstanding, and yields results in
+    # completion order. Long input streams are processed with bounded memory.
+    in_flight: List[Future] = []
+    for item in items:
+        in_flight.append(submit(item))
+        if len(in_flight) >= max_in_flight:
+            done, pending = wait(in_flight, return_when=FIRST_COMPLETED)
+            in_flight = list(pending)
+            for future in done:
+                yield future.result()
+    for future in in_flight:
+        yield future.result()
@@ -0,0 +1,93 @@
+# perft.py
+
+import argparse
+import sys
+import time
+from typing import Dict, List, Optional
+
+from board import Board, POSITION_CACHE
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Reference node counts from https://www.chessprogramming.org/Perft_Results
+POSITIONS = {
+    "start": (START_FEN, [20, 400, 8902, 197281, 4865609]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 [48, 2039, 97862, 4085603]),
+    "endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    "promotions": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                   [6, 264, 9467, 422333]),
+    "castling": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    "middlegame": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                   [46, 2079, 89890, 3894594]),
+}
+
+
+def perft(board: Board, depth: int) -> int:
+    moves = board.legal_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def divide(board: Board, depth: int) -> Dict[str, int]:
+    counts = {}
+    for move in board.legal_moves():
+        board.push(move)
+        counts[move.uci()] = perft(board, depth - 1)
+        board.pop()
+    return counts
+
+
+def run(fen: str, depth: int, show_divide: bool = False, expected: Optional[int] = None) -> bool:
+    board = Board.from_fen(fen)
+    POSITION_CACHE.clear()  # Keep timings comparable between runs
+    start = time.perf_counter()
+    if show_divide:
+        counts = divide(board, depth)
+        for uci, count in sorted(counts.items()):
+            print(f"  {uci}: {count}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board, depth)
+    elapsed = time.perf_counter() - start
+
+    nps = nodes / elapsed if elapsed > 0 else 0.0
+    status = ""
+    if expected is not None:
+        status = "ok" if nodes == expected else f"FAIL (expected {expected})"
+    print(f"depth {depth}: {nodes} nodes in {elapsed:.3f}s ({nps:,.0f} nps) {status}".rstrip())
+    return expected is None or nodes == expected
+
+
+def run_suite(max_depth: int, names: Optional[List[str]] = None) -> bool:
+    passed = True
+    for name in names or POSITIONS:
+        fen, counts = POSITIONS[name]
+        print(f"{name}: {fen}")
+        for depth, expected in enumerate(counts[:max_depth], start=1):
+            passed &= run(fen, depth, expected=expected)
+    return passed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Count move generation leaf nodes to a fixed depth.")
+    parser.add_argument("--fen", help="position to search (default: start position)")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print node counts per root move")
+    parser.add_argument("--suite", nargs="*", metavar="NAME", choices=list(POSITIONS),
+                        help="check the reference positions up to --depth")
+    args = parser.parse_args(argv)
+
+    if args.suite is not None:
+        return 0 if run_suite(args.depth, args.suite) else 1
+    return 0 if run(args.fen or START_FEN, args.depth, args.divide) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# pgn.py
+
+import argparse
+import json
+import mmap
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from board import Board
+from parallel import bounded_results, worker_count
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+TAG_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+# Comments, variations and annotations are dropped before the moves are split into tokens
+COMMENT_PATTERN = re.compile(r"\{[^}]*\}|;[^\n]*")
+MOVE_NUMBER_PATTERN = re.compile(r"^\d+\.+")
+NAG_PATTERN = re.compile(r"^\$\d+$")
+
+
+class PgnGame(NamedTuple):
+    index: int
+    headers: Dict[str, str]
+    movetext: str
+
+
+class GameResult(NamedTuple):
+    index: int
+    headers: Dict[str, str]
+    plies: int
+    result: Optional[str]
+    fen: Optional[str]
+    error: Optional[str] = None
+
+
+def _lines(path: str, use_mmap: bool) -> Iterator[str]:
+    with open(path, "rb") as handle:
+        if use_mmap:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for line in iter(mapped.readline, b""):
+                    yield line.decode("utf-8", "replace")
+        else:
+            for line in handle:
+                yield line.decode("utf-8", "replace")
+
+
+def _in_comment(line: str, in_comment: bool) -> bool:
+    # Whether a {...} comment is still open at the end of the line; braces after a ; comment don't count
+    for char in line:
+        if in_comment:
+            in_comment = char != "}"
+        elif char == "{":
+            in_comment = True
+        elif char == ";":
+            break
+    return in_comment
+
+
+def read_games(path: str, use_mmap: bool = False) -> Iterator[PgnGame]:
+    # Streams one game at a time, so memory stays flat however large the file is.
+    # Lines are joined with newlines so a ; comment ends where its line does.
+    headers: Dict[str, str] = {}
+    movetext: List[str] = []
+    index = 0
+    in_comment = False
+    for line in _lines(path, use_mmap):
+        line = line.strip()
+        if line.startswith("[") and not in_comment:
+            if movetext:
+                yield PgnGame(index, headers, "\n".join(movetext))
+                index += 1
+                headers, movetext = {}, []
+            match = TAG_PATTERN.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2)
+        elif line and (in_comment or not line.startswith("%")):
+            movetext.append(line)
+            in_comment = _in_comment(line, in_comment)
+    if headers or movetext:
+        yield PgnGame(index, headers, "\n".join(movetext))
+
+
+def _strip_variations(movetext: str) -> str:
+    depth = 0
+    kept = []
+    for char in movetext:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            kept.append(char)
+    return "".join(kept)
+
+
+def san_tokens(movetext: str) -> Iterator[str]:
+    for token in _strip_variations(COMMENT_PATTERN.sub(" ", movetext)).split():
+        token = MOVE_NUMBER_PATTERN.sub("", token)
+        if token and token not in RESULTS and not NAG_PATTERN.match(token):
+            yield token
+
+
+def replay_game(game: PgnGame) -> GameResult:
+    fen = game.headers.get("FEN")
+    plies = 0
+    try:
+        board = Board.from_fen(fen) if fen else Board()
+        for san in san_tokens(game.movetext):
+            board.push_san(san)
+            plies += 1
+    except ValueError as e:
+        return GameResult(game.index, game.headers, plies, game.headers.get("Result"), None, str(e))
+    return GameResult(game.index, game.headers, plies, game.headers.get("Result"), board.fen())
+
+
+def _replay_batch(games: List[PgnGame]) -> List[GameResult]:
+    return [replay_game(game) for game in games]
+
+
+def _batches(games: Iterable[PgnGame], size: int) -> Iterator[List[PgnGame]]:
+    batch = []
+    for game in games:
+        batch.append(game)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def replay_file(path: str, workers: Optional[int] = None, batch_size: int = 64,
+                use_mmap: bool = False) -> Iterator[GameResult]:
+    # Results arrive in completion order. Only a few batches per worker are in flight at once,
+    # so the reader never runs ahead of the pool by more than that.
+    games = read_games(path, use_mmap)
+    if workers == 1:
+        for game in games:
+            yield replay_game(game)
+        return
+
+    workers = worker_count(workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in bounded_results(lambda batch: pool.submit(_replay_batch, batch),
+                                       _batches(games, batch_size), 2 * workers):
+            yield from results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay and validate PGN games through the rules engine.")
+    parser.add_argument("pgn")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core, 1 = in-process)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--mmap", action="store_true", help="memory-map the input file")
+    parser.add_argument("--jsonl", action="store_true", help="print one JSON line per game")
+    parser.add_argument("--progress", type=int, default=0, metavar="N", help="report throughput every N games")
+    args = parser.parse_args(argv)
+
+    games = errors = plies = 0
+    start = time.perf_counter()
+    for result in replay_file(args.pgn, args.workers, args.batch_size, args.mmap):
+        games += 1
+        plies += result.plies
+        if result.error:
+            errors += 1
+        if args.jsonl:
+            print(json.dumps(result._asdict()))
+        elif result.error:
+            print(f"game {result.index}: {result.error}")
+        if args.progress and games % args.progress == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{games} games, {games / elapsed:,.1f} games/s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    rate = games / elapsed if elapsed > 0 else 0.0
+    print(f"{games} games ({errors} with errors), {plies} plies in {elapsed:.2f}s: "
+          f"{rate:,.1f} games/s, {plies / elapsed if elapsed > 0 else 0:,.0f} plies/s", file=sys.stderr)
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+# renderer.py
+
+from collections import deque
+from typing import Iterable, List, Optional, Set, Tuple
+
+import pygame
+
+from pieces import Piece
+from sprites import get_sprite, SQUARE_SIZE
+
+LIGHT_SQUARE = pygame.Color(235, 236, 208)
+DARK_SQUARE = pygame.Color(119, 149, 86)
+HIGHLIGHT = (0, 255, 0)
+
+_UNKNOWN = object()
+
+
+class BoardRenderer:
+    # Redraws only the squares whose piece or highlight changed since the last frame and
+    # pushes just those rectangles to the display.
+    def __init__(self, win: pygame.Surface, square_size: int = SQUARE_SIZE):
+        self.win = win
+        self.square_size = square_size
+        self.background = self._render_background()
+        self._drawn: List[object] = [_UNKNOWN] * 64
+        self._highlights: Set[Tuple[int, int]] = set()
+
+    def _render_background(self) -> pygame.Surface:
+        size = self.square_size
+        background = pygame.Surface((size * 8, size * 8))
+        for row in range(8):
+            for col in range(8):
+                color = (LIGHT_SQUARE, DARK_SQUARE)[(row + col) % 2]
+                background.fill(color, pygame.Rect(col * size, row * size, size, size))
+        return background.convert() if pygame.display.get_surface() else background
+
+    def square_rect(self, pos: Tuple[int, int]) -> pygame.Rect:
+        row, col = pos
+        return pygame.Rect(col * self.square_size, row * self.square_size, self.square_size, self.square_size)
+
+    def invalidate(self, squares: Optional[Iterable[Tuple[int, int]]] = None):
+        # Force a repaint, e.g. after something else drew over the board
+        if squares is None:
+            self._drawn = [_UNKNOWN] * 64
+        else:
+            for row, col in squares:
+                self._drawn[(7 - row) * 8 + col] = _UNKNOWN
+
+    def invalidate_rect(self, rect: pygame.Rect):
+        size = self.square_size
+        self.invalidate((row, col) for row in range(8) for col in range(8)
+                        if rect.colliderect(pygame.Rect(col * size, row * size, size, size)))
+
+    def render(self, board, highlights: Iterable[Tuple[int, int]] = ()) -> List[pygame.Rect]:
+        highlights = set(highlights)
+        squares = board.position.squares
+        dirty = set(self._highlights ^ highlights)
+        for square in range(64):
+            if squares[square] != self._drawn[square]:
+                dirty.add((7 - (square >> 3), square & 7))
+
+        rects = []
+        for pos in dirty:
+            rect = self.square_rect(pos)
+            self.win.blit(self.background, rect, rect)
+            square = (7 - pos[0]) * 8 + pos[1]
+            occupant = squares[square]
+            if occupant:
+                sprite = get_sprite(occupant[0], occupant[1], self.square_size)
+                if sprite:
+                    self.win.blit(sprite, rect)
+            if pos in highlights:
+                pygame.draw.circle(self.win, HIGHLIGHT, rect.center, self.square_size // 8)
+            self._drawn[square] = occupant
+            rects.append(rect)
+        self._highlights = highlights
+        return rects
+
+    def present(self, rects: List[pygame.Rect]) -> bool:
+        if rects:
+            pygame.display.update(rects)
+        return bool(rects)
+
+
+def get_square_under_mouse(board: List[List[Optional[Piece]]]) -> Tuple[Optional[Piece], Tuple[int, int]]:
+    mouse_pos = pygame.mouse.get_pos()
+    col, row = mouse_pos[0] // SQUARE_SIZE, mouse_pos[1] // SQUARE_SIZE
+    if 0 <= col < 8 and 0 <= row < 8:
+        return board[row][col], (row, col)
+    return None, (0, 0)
+
+
+class MessageOverlay:
+    # Queue of timed messages drawn by the main loop; nothing here blocks or flips the display
+    def __init__(self, font_size=36, color=(255, 0, 0), background=(235, 236, 208)):
+        self.font_size = font_size
+        self.color = color
+        self.background = background
+        self._font = None
+        self._queue = deque()
+        self._current = None  # (surface, rect, expires_at_ms, transient)
+        self._drawn = False
+
+    @property
+    def active(self):
+        return self._current is not None or bool(self._queue)
+
+    def show(self, message, duration=2, transient=True):
+        # A new message replaces any transient one showing or waiting, so stale "Invalid Move" banners
+        # never pile up. Messages shown with transient=False, like a game result, are always played in full.
+        self._queue = deque(entry for entry in self._queue if not entry[2])
+        self._queue.append((message, duration, transient))
+        if self._current is not None and self._current[3]:
+            self._current = (*self._current[:2], 0, True)  # Expire on the next update
+
+    def clear(self):
+        self._queue.clear()
+        self._current = None
+
+    def update(self, win, now_ms):
+        # Advance the queue; returns the area of a message that just disappeared so it can be repainted
+        cleared = None
+        if self._current is not None and now_ms >= self._current[2]:
+            cleared = self._current[1]
+            self._current = None
+        if self._current is None and self._queue:
+            message, duration, transient = self._queue.popleft()
+            if self._font is None:
+                self._font = pygame.font.Font(None, self.font_size)
+            # An opaque background makes redrawing the message idempotent
+            text = self._font.render(message, True, self.color, self.background)
+            text_rect = text.get_rect(center=(win.get_width() // 2, win.get_height() // 2))
+            self._current = (text, text_rect, now_ms + duration * 1000, transient)
+            self._drawn = False
+        return cleared
+
+    def draw(self, win, dirty_rects):
+        if self._current is None:
+            return []
+        text, text_rect = self._current[:2]
+        if self._drawn and text_rect.collidelist(dirty_rects) == -1:
+            return []
+        win.blit(text, text_rect)
+        self._drawn = True
+        return [text_rect]
+
+
+class MetricsOverlay:
+    # Live timings from instrumentation.metrics in the top-left corner, refreshed a couple of times a second
+    def __init__(self, metrics, interval_ms=500, font_size=20, color=(255, 255, 255), background=(0, 0, 0)):
+        self.metrics = metrics
+        self.interval_ms = interval_ms
+        self.font_size = font_size
+        self.color = color
+        self.background = background
+        self.visible = False
+        self._font = None
+        self._surface = None
+        self._rect = None
+        self._next_refresh = 0
+        self._drawn = False
+
+    def toggle(self):
+        # Returns the area to repaint when the overlay is hidden
+        self.visible = not self.visible
+        self._next_refresh = 0
+        if self.visible:
+            return None
+        cleared, self._surface, self._rect = self._rect, None, None
+        return cleared
+
+    def update(self, now_ms):
+        # Re-renders the text when due; returns the previous area so the board underneath can be repainted
+        if not self.visible or now_ms < self._next_refresh:
+            return None
+        self._next_refresh = now_ms + self.interval_ms
+        if self._font is None:
+            self._font = pygame.font.Font(None, self.font_size)
+        lines = self.metrics.summary_lines() or ["no samples yet"]
+        rendered = [self._font.render(line, True, self.color, self.background) for line in lines]
+        surface = pygame.Surface((max(text.get_width() for text in rendered) + 8,
+                                  sum(text.get_height() for text in rendered) + 8))
+        surface.fill(self.background)
+        y = 4
+        for text in rendered:
+            surface.blit(text, (4, y))
+            y += text.get_height()
+        cleared = self._rect
+        self._surface, self._rect = surface, surface.get_rect(topleft=(0, 0))
+        self._drawn = False
+        return cleared
+
+    def draw(self, win, dirty_rects):
+        if self._surface is None:
+            return []
+        if self._drawn and self._rect.collidelist(dirty_rects) == -1:
+            return []
+        win.blit(self._surface, self._rect)
+        self._drawn = True
+        return [self._rect]
@@ -0,0 +1,423 @@
+# search.py
+
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from bitboard import iter_squares, COLORS
+from board import Board
+from cache import LRUCache
+from instrumentation import timed
+from move import Move
+from timecontrol import GameClock
+
+MATE = 100_000
+INFINITY = 1_000_000
+MAX_PLY = 128
+# The clock is read every 128 nodes, a few milliseconds at this engine's speed, so searches end close to their budget
+CHECK_INTERVAL = 127
+
+PIECE_VALUES = {'p': 100, 'n': 320, 'b': 330, 'r': 500, 'q': 900, 'k': 20_000}
+
+# Piece-square tables from White's point of view, written rank 8 first as on a printed board
+PIECE_SQUARE_TABLES = {
+    'p': [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    'n': [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    'b': [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    'r': [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    'q': [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    'k': [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+KING_ENDGAME_TABLE = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+
+def _square_values(table: List[int], value: int) -> Dict[str, List[int]]:
+    # The printed tables start at a8, so White reads them through sq ^ 56 and Black reads them as is
+    return {'w': [value + table[square ^ 56] for square in range(64)],
+            'b': [value + table[square] for square in range(64)]}
+
+
+SQUARE_VALUES = {name: _square_values(table, PIECE_VALUES[name]) for name, table in PIECE_SQUARE_TABLES.items()}
+KING_ENDGAME_VALUES = _square_values(KING_ENDGAME_TABLE, PIECE_VALUES['k'])
+
+# Time (seconds) and depth budgets per difficulty; the time matches the Stockfish backend
+DIFFICULTY_BUDGETS = {difficulty: (0.1 * difficulty, 1 + difficulty) for difficulty in range(1, 11)}
+
+
+def evaluate(board: Board) -> int:
+    # Material plus piece-square bonus, from the side to move's point of view
+    position = board.position
+    non_pawn_material = 0
+    for color in COLORS:
+        pieces = position.pieces[color]
+        for name in ('n', 'b', 'r', 'q'):
+            non_pawn_material += PIECE_VALUES[name] * pieces[name].bit_count()
+    endgame = non_pawn_material <= 1300
+
+    score = 0
+    for color in COLORS:
+        pieces = position.pieces[color]
+        total = 0
+        for name in ('p', 'n', 'b', 'r', 'q'):
+            values = SQUARE_VALUES[name][color]
+            for square in iter_squares(pieces[name]):
+                total += values[square]
+        king_values = (KING_ENDGAME_VALUES if endgame else SQUARE_VALUES['k'])[color]
+        for square in iter_squares(pieces['k']):
+            total += king_values[square]
+        score += total if color == 'w' else -total
+    return score if board.current_turn == 'w' else -score
+
+
+class TTEntry(NamedTuple):
+    key: int
+    depth: int
+    score: int
+    flag: int
+    move: Optional[Move]
+    generation: int
+
+
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+
+class TranspositionTable:
+    def __init__(self, size: int = 1 << 18):
+        self.size = size
+        self.generation = 0
+        self._slots: List[Optional[TTEntry]] = [None] * size
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        entry = self._slots[key % self.size]
+        return entry if entry is not None and entry.key == key else None
+
+    def store(self, key: int, depth: int, score: int, flag: int, move: Optional[Move]):
+        index = key % self.size
+        slot = self._slots[index]
+        # Keep deeper results from the current search; anything from an older search is fair game
+        if slot is None or slot.generation != self.generation or depth >= slot.depth or slot.key == key:
+            self._slots[index] = TTEntry(key, depth, score, flag, move, self.generation)
+
+    def clear(self):
+        self._slots = [None] * self.size
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class NativeAI:
+    def __init__(self, difficulty, move_time: Optional[float] = None, max_depth: Optional[int] = None,
+                 max_nodes: Optional[int] = None, tt_size: int = 1 << 18, verbose: bool = False,
+                 clock: Optional[GameClock] = None, cache_size: int = 10_000):
+        self.difficulty = difficulty
+        default_time, default_depth = DIFFICULTY_BUDGETS.get(difficulty, (0.1 * difficulty, 1 + difficulty))
+        self.move_time = default_time if move_time is None else move_time
+        self.max_depth = max_depth or default_depth
+        self.max_nodes = max_nodes
+        self.clock = clock
+        # Best moves by position, so a pondered reply is instant when the guess was right
+        self.cache = LRUCache(maxsize=cache_size)
+        # Set from another thread to end the current search early; whoever sets it also clears it
+        self.stop_event = threading.Event()
+        self.verbose = verbose
+        self.tt = TranspositionTable(tt_size)
+        self.history: Dict[Tuple[str, int, int], int] = {}
+        self.killers: List[List[Optional[Move]]] = []
+        self.nodes = 0
+        self.depth = 0
+        self.elapsed = 0.0
+        self._deadline = 0.0
+        self._root_best: Optional[Move] = None
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def get_best_move(self, board_fen: str, ponder: bool = False) -> Optional[Move]:
+        board = Board.from_fen(board_fen)
+        move = self.cache.get(board.key)
+        if move is None:
+            move = self.search(board, ponder)
+            # A search cut short before its first full iteration has only a guess to offer, so it isn't kept
+            if move is not None and self.depth > 0 and not self.stop_event.is_set():
+                self.cache.put(board.key, move)
+        return move
+
+    def search(self, board: Board, ponder: bool = False) -> Optional[Move]:
+        self.depth = 0
+        moves = board.legal_moves()
+        if not moves:
+            return None
+        if len(moves) == 1:
+            return moves[0]  # Forced reply, nothing to think about
+        return (self._timed_ponder if ponder else self._timed_search)(board, moves)
+
+    def _iterate(self, board: Board, moves: List[Move]) -> Move:
+        move_time = self.move_time
+        # Like ChessAI, a search without a time limit (fixed depth or nodes) ignores the clock
+        if self.clock is not None and move_time:
+            move_time = self.clock.budget(board.current_turn, board.fullmove_number)
+        start = time.perf_counter()
+        self._deadline = start + move_time if move_time else float('inf')
+        self.nodes = 0
+        self.tt.generation += 1
+        self.history = {}
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+
+        best_move = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self._search_root(board, depth)
+            except _BudgetExceeded:
+                # The previous best move is searched first, so a move that beat it in the unfinished
+                # iteration is better still
+                if self._root_best is not None:
+                    best_move = self._root_best
+                break
+            best_move = move
+            self.depth = depth
+            self.elapsed = time.perf_counter() - start
+            if self.verbose:
+                print(f"info depth {depth} score cp {score} nodes {self.nodes} nps {self.nps:.0f} pv {move.uci()}")
+            if abs(score) >= MATE - 100:
+                break  # Forced mate found, deeper search won't change the move
+        self.elapsed = time.perf_counter() - start
+        if best_move is None:
+            # Out of time before any root move was searched; fall back to the best-ordered one
+            entry = self.tt.probe(board.key)
+            best_move = self._order(board, moves, entry.move if entry else None, 0)[0]
+        return best_move
+
+    # Ponder searches get their own timer so speculation doesn't blur the latency of requested moves
+    _timed_search = timed("engine")(_iterate)
+    _timed_ponder = timed("ponder")(_iterate)
+
+    def _check_budget(self):
+        if time.perf_counter() >= self._deadline or (self.max_nodes and self.nodes >= self.max_nodes) or \
+                self.stop_event.is_set():
+            raise _BudgetExceeded
+
+    def _search_root(self, board: Board, depth: int) -> Tuple[int, Move]:
+        alpha, beta = -INFINITY, INFINITY
+        entry = self.tt.probe(board.key)
+        best_move = self._root_best = None
+        for move in self._order(board, board.legal_moves(), entry.move if entry else None, 0):
+            self._check_budget()
+            board.push(move)
+            try:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, 1)
+            finally:
+                board.pop()
+            if score > alpha or best_move is None:
+                alpha, best_move = score, move
+                self._root_best = move
+        self.tt.store(board.key, depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax(self, board: Board, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes & CHECK_INTERVAL == 0:
+            self._check_budget()
+        if board.halfmove_clock >= 100 or board.is_repetition(2):
+            return 0
+        if ply >= MAX_PLY - 1:
+            return evaluate(board)
+
+        in_check = board.is_check()
+        if depth <= 0:
+            if not in_check:
+                return self._quiesce(board, alpha, beta)
+            depth = 1  # Don't stand pat while in check
+
+        key = board.key
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry.move
+            if entry.depth >= depth:
+                score = self._score_from_tt(entry.score, ply)
+                if entry.flag == EXACT:
+                    return score
+                if entry.flag == LOWER_BOUND and score >= beta:
+                    return score
+                if entry.flag == UPPER_BOUND and score <= alpha:
+                    return score
+
+        moves = board.legal_moves()
+        if not moves:
+            return -MATE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score, best_move = -INFINITY, None
+        for move in self._order(board, moves, tt_move, ply):
+            quiet = not self._is_capture(board, move) and not move.promotion
+            board.push(move)
+            try:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if quiet:
+                    killers = self.killers[ply]
+                    if killers[0] != move:
+                        killers[1], killers[0] = killers[0], move
+                    history_key = (board.current_turn, move.from_square, move.to_square)
+                    self.history[history_key] = self.history.get(history_key, 0) + depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, self._score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def _quiesce(self, board: Board, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.nodes & CHECK_INTERVAL == 0:
+            self._check_budget()
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        captures = [move for move in board.legal_moves() if self._is_capture(board, move) or move.promotion == 'q']
+        for move in sorted(captures, key=lambda move: self._capture_score(board, move), reverse=True):
+            board.push(move)
+            try:
+                score = -self._quiesce(board, -beta, -alpha)
+            finally:
+                board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    @staticmethod
+    def _is_capture(board: Board, move: Move) -> bool:
+        position = board.position
+        if position.squares[move.to_square] is not None:
+            return True
+        return move.to_square == position.ep_square and position.squares[move.from_square][1] == 'p'
+
+    @staticmethod
+    def _capture_score(board: Board, move: Move) -> int:
+        # MVV-LVA: most valuable victim first, cheapest attacker breaking ties
+        squares = board.position.squares
+        victim = squares[move.to_square]
+        victim_value = PIECE_VALUES[victim[1]] if victim else PIECE_VALUES['p']
+        score = 10 * victim_value - PIECE_VALUES[squares[move.from_square][1]] // 10
+        if move.promotion:
+            score += PIECE_VALUES[move.promotion]
+        return score
+
+    def _order(self, board: Board, moves: List[Move], tt_move: Optional[Move], ply: int) -> List[Move]:
+        killers = self.killers[ply]
+        history = self.history
+        color = board.current_turn
+
+        def priority(move: Move) -> int:
+            if move == tt_move:
+                return 10_000_000
+            if self._is_capture(board, move) or move.promotion:
+                return 1_000_000 + self._capture_score(board, move)
+            if move == killers[0]:
+                return 900_000
+            if move == killers[1]:
+                return 800_000
+            return history.get((color, move.from_square, move.to_square), 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    @staticmethod
+    def _score_to_tt(score: int, ply: int) -> int:
+        # Mate scores are stored relative to the node, not the root
+        if score >= MATE - 1000:
+            return score + ply
+        if score <= -MATE + 1000:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _score_from_tt(score: int, ply: int) -> int:
+        if score >= MATE - 1000:
+            return score - ply
+        if score <= -MATE + 1000:
+            return score + ply
+        return score
+
+    def close(self):
+        self.tt.clear()
+        self.cache.clear()
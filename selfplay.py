@@ -0,0 +1,330 @@
+# selfplay.py
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from board import Board
+from chessai import create_ai
+from parallel import bounded_results, worker_count
+from timecontrol import GameClock, TimeControl
+
+MAX_PLIES = 400
+
+
+class PlayerConfig(NamedTuple):
+    name: str
+    backend: str
+    difficulty: int
+    depth: Optional[int] = None
+    nodes: Optional[int] = None
+
+    @property
+    def engine_key(self) -> Tuple[str, int, Optional[int], Optional[int]]:
+        return self.backend, self.difficulty, self.depth, self.nodes
+
+
+class GameRecord(NamedTuple):
+    index: int
+    white: str
+    black: str
+    result: str
+    termination: str
+    moves: List[str]
+    opening_plies: int
+    latencies: Dict[str, List[float]]
+    fen: str
+    error: Optional[str] = None
+
+
+# Engines live for the whole worker process so Stockfish startup and transposition tables
+# are paid for once per worker rather than once per game
+_engines: Dict[Tuple[str, int, Optional[int], Optional[int]], object] = {}
+
+
+def _engine(player: PlayerConfig, instances: int = 1):
+    key = player.engine_key
+    engine = _engines.get(key)
+    if engine is None:
+        # One search thread per engine and a hash share per engine on the machine keep latencies comparable.
+        # Move caches, the book and the analysis cache stay off: a remembered answer comes back in no time
+        # and would skew the latencies this harness measures.
+        engine = _engines[key] = create_ai(player.difficulty, player.backend, threads=1, instances=instances,
+                                           depth=player.depth, nodes=player.nodes, cache_size=0, book_path=None,
+                                           analysis_cache=None)
+    return engine
+
+
+def _drop_engine(key: Tuple[str, int, Optional[int], Optional[int]]):
+    engine = _engines.pop(key, None)
+    if engine is not None:
+        try:
+            engine.close()
+        except Exception:
+            pass
+
+
+def close_engines():
+    # Must run before interpreter shutdown: python-chess drives each engine from a non-daemon thread,
+    # and Python joins those before it would get to any atexit handler
+    for key in list(_engines):
+        _drop_engine(key)
+
+
+def _init_worker():
+    # Pool workers skip atexit entirely; multiprocessing finalizers run before the thread join
+    Finalize(None, close_engines, exitpriority=0)
+
+
+def insufficient_material(board: Board) -> bool:
+    pieces = board.position.pieces
+    for color in ('w', 'b'):
+        if pieces[color]['p'] or pieces[color]['r'] or pieces[color]['q']:
+            return False
+    minors = sum((pieces[color]['n'] | pieces[color]['b']).bit_count() for color in ('w', 'b'))
+    return minors <= 1
+
+
+def game_over(board: Board) -> Optional[Tuple[str, str]]:
+    if not board.legal_moves():
+        if board.is_check():
+            return ('0-1' if board.current_turn == 'w' else '1-0'), "checkmate"
+        return '1/2-1/2', "stalemate"
+    if board.halfmove_clock >= 100:
+        return '1/2-1/2', "fifty-move rule"
+    if board.is_repetition(3):
+        return '1/2-1/2', "threefold repetition"
+    if insufficient_material(board):
+        return '1/2-1/2', "insufficient material"
+    return None
+
+
+def play_game(index: int, white: PlayerConfig, black: PlayerConfig, time_control: Optional[TimeControl] = None,
+              opening_plies: int = 0, seed: int = 0, max_plies: int = MAX_PLIES,
+              engine_instances: int = 1) -> GameRecord:
+    board = Board()
+    players = {'w': white, 'b': black}
+    latencies: Dict[str, List[float]] = {'w': [], 'b': []}
+    clock = GameClock(time_control) if time_control else None
+    moves: List[str] = []
+    rng = random.Random(seed * 1_000_003 + index)
+
+    for _ in range(opening_plies):
+        legal = board.legal_moves()
+        if not legal:
+            break
+        move = rng.choice(legal)
+        moves.append(board.san(move))
+        board.push(move)
+    opening = len(moves)
+
+    outcome = game_over(board)
+    while outcome is None:
+        if len(moves) >= max_plies:
+            outcome = '1/2-1/2', "adjudicated at ply limit"
+            break
+        color = board.current_turn
+        player = players[color]
+        try:
+            engine = _engine(player, engine_instances)
+            # Engines are reused across games, so hand each one this game's clock before it moves
+            engine.clock = clock
+            start = time.perf_counter()
+            best = engine.get_best_move(board.fen())
+            elapsed = time.perf_counter() - start
+            move = board.parse_uci(best.uci())
+        except Exception as e:
+            _drop_engine(player.engine_key)
+            return GameRecord(index, white.name, black.name, '*', "engine error", moves, opening, latencies,
+                              board.fen(), f"{player.name}: {e}")
+
+        latencies[color].append(elapsed)
+        if clock is not None and not clock.charge(color, elapsed):
+            outcome = ('0-1' if color == 'w' else '1-0'), "time forfeit"
+            break
+        moves.append(board.san(move))
+        board.push(move)
+        outcome = game_over(board)
+
+    result, termination = outcome
+    return GameRecord(index, white.name, black.name, result, termination, moves, opening, latencies, board.fen())
+
+
+def to_pgn(record: GameRecord, time_control: Optional[TimeControl] = None) -> str:
+    headers = [
+        ("Event", "Self-play"),
+        ("Site", "?"),
+        ("Date", time.strftime("%Y.%m.%d")),
+        ("Round", str(record.index + 1)),
+        ("White", record.white),
+        ("Black", record.black),
+        ("Result", record.result),
+        ("TimeControl", str(time_control) if time_control else "-"),
+        ("Termination", record.termination),
+        ("PlyCount", str(len(record.moves))),
+    ]
+    lines = [f'[{name} "{value}"]' for name, value in headers]
+    lines.append("")
+
+    tokens = []
+    for ply, san in enumerate(record.moves):
+        if ply % 2 == 0:
+            tokens.append(f"{ply // 2 + 1}.")
+        tokens.append(san)
+    tokens.append(record.result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def run_match(player_a: PlayerConfig, player_b: PlayerConfig, games: int, workers: Optional[int] = None,
+              time_control: Optional[TimeControl] = None, opening_plies: int = 0, seed: int = 0,
+              max_plies: int = MAX_PLIES) -> Iterator[GameRecord]:
+    # Colours alternate so each pairing is played from both sides. Records arrive in completion order.
+    workers = worker_count(workers)
+    engines_per_worker = len({player.engine_key for player in (player_a, player_b)})
+    instances = workers * engines_per_worker
+
+    def pairing(index):
+        white, black = (player_a, player_b) if index % 2 == 0 else (player_b, player_a)
+        return index, white, black, time_control, opening_plies, seed, max_plies, instances
+
+    if workers == 1:
+        try:
+            for index in range(games):
+                yield play_game(*pairing(index))
+        finally:
+            close_engines()
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        yield from bounded_results(lambda index: pool.submit(play_game, *pairing(index)), range(games), 2 * workers)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def elo_difference(score: float) -> float:
+    # Logistic Elo model; a perfect or zero score is clamped so the estimate stays finite
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return 400 * math.log10(score / (1 - score))
+
+
+class MatchStats:
+    def __init__(self, player_a: str, player_b: str):
+        self.player_a = player_a
+        self.player_b = player_b
+        self.wins = self.draws = self.losses = self.errors = 0
+        self.plies = 0
+        self.latencies: Dict[str, List[float]] = {player_a: [], player_b: []}
+        self.terminations: Dict[str, int] = {}
+        self.start = time.perf_counter()
+
+    def add(self, record: GameRecord):
+        self.terminations[record.termination] = self.terminations.get(record.termination, 0) + 1
+        self.plies += len(record.moves) - record.opening_plies
+        self.latencies[record.white].extend(record.latencies['w'])
+        self.latencies[record.black].extend(record.latencies['b'])
+        if record.result == '*':
+            self.errors += 1
+        elif record.result == '1/2-1/2':
+            self.draws += 1
+        elif (record.result == '1-0') == (record.white == self.player_a):
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    def summary(self) -> dict:
+        games = self.wins + self.draws + self.losses
+        score = (self.wins + 0.5 * self.draws) / games if games else 0.5
+        elapsed = time.perf_counter() - self.start
+        return {
+            "games": games,
+            "errors": self.errors,
+            "wins": self.wins,
+            "draws": self.draws,
+            "losses": self.losses,
+            "score": score,
+            "elo": elo_difference(score) if games else 0.0,
+            "elapsed": elapsed,
+            "moves_per_second": self.plies / elapsed if elapsed > 0 else 0.0,
+            "terminations": self.terminations,
+            "latency": {
+                name: {"moves": len(values), "p50": percentile(values, 0.5), "p90": percentile(values, 0.9),
+                       "p99": percentile(values, 0.99), "max": max(values, default=0.0)}
+                for name, values in self.latencies.items()
+            },
+        }
+
+
+def _player(text: str, default_backend: str) -> Tuple[str, int]:
+    # "native:3" or just "3"
+    backend, _, difficulty = text.rpartition(':')
+    return backend or default_backend, int(difficulty)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Play headless engine-vs-engine matches.")
+    parser.add_argument("player_a", help="[backend:]difficulty, e.g. native:2 or stockfish:5")
+    parser.add_argument("player_b", help="[backend:]difficulty")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core, 1 = in-process)")
+    parser.add_argument("--backend", default="auto", help="backend for players given without one")
+    parser.add_argument("--tc", type=TimeControl.parse, help="time control per side as base+increment seconds")
+    parser.add_argument("--depth", type=int, help="search every move to this depth instead of by time")
+    parser.add_argument("--nodes", type=int, help="search every move for this many nodes instead of by time")
+    parser.add_argument("--opening-plies", type=int, default=4, help="random plies played before the engines take over")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pgn", help="append finished games to this PGN file")
+    parser.add_argument("--json", help="append one JSON line per finished game to this file")
+    args = parser.parse_args(argv)
+
+    players = []
+    for label, text in (("A", args.player_a), ("B", args.player_b)):
+        backend, difficulty = _player(text, args.backend)
+        players.append(PlayerConfig(f"{label} {backend}:{difficulty}", backend, difficulty, args.depth, args.nodes))
+
+    stats = MatchStats(players[0].name, players[1].name)
+    pgn_file = open(args.pgn, "a") if args.pgn else None
+    json_file = open(args.json, "a") if args.json else None
+    try:
+        for record in run_match(players[0], players[1], args.games, args.workers, args.tc,
+                                args.opening_plies, args.seed, args.max_plies):
+            stats.add(record)
+            if pgn_file:
+                pgn_file.write(to_pgn(record, args.tc))
+                pgn_file.flush()
+            if json_file:
+                json_file.write(json.dumps(record._asdict()) + "\n")
+                json_file.flush()
+            print(f"game {record.index + 1}: {record.white} vs {record.black} {record.result} ({record.termination})"
+                  + (f" error: {record.error}" if record.error else ""), file=sys.stderr)
+    finally:
+        for handle in (pgn_file, json_file):
+            if handle:
+                handle.close()
+
+    print(json.dumps(stats.summary(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# sprites.py
+
+import os
+from typing import Dict, Optional, Tuple
+
+import pygame
+
+from bitboard import COLORS, PIECE_TYPES
+
+IMAGE_DIR = "images"
+SQUARE_SIZE = 80
+
+# Decoded, scaled piece images shared by every Piece in the process
+_sprites: Dict[Tuple[str, str, int], pygame.Surface] = {}
+
+
+def _load(color: str, name: str, size: int) -> pygame.Surface:
+    image_path = os.path.join(IMAGE_DIR, f"{color}{name}.png")
+    return pygame.transform.scale(pygame.image.load(image_path), (size, size))
+
+
+def load_sprites(size: int = SQUARE_SIZE, atlas: bool = True):
+    # Decode all twelve images up front. With atlas=True they are packed into one converted
+    # surface and handed out as subsurfaces, which keeps blits on a single pixel buffer.
+    if atlas:
+        sheet = pygame.Surface((size * len(PIECE_TYPES), size * len(COLORS)), pygame.SRCALPHA)
+        for row, color in enumerate(COLORS):
+            for col, name in enumerate(PIECE_TYPES):
+                sheet.blit(_load(color, name, size), (col * size, row * size))
+        sheet = sheet.convert_alpha()
+        for row, color in enumerate(COLORS):
+            for col, name in enumerate(PIECE_TYPES):
+                _sprites[color, name, size] = sheet.subsurface(pygame.Rect(col * size, row * size, size, size))
+    else:
+        for color in COLORS:
+            for name in PIECE_TYPES:
+                get_sprite(color, name, size)
+
+
+def get_sprite(color: str, name: str, size: int = SQUARE_SIZE) -> Optional[pygame.Surface]:
+    sprite = _sprites.get((color, name, size))
+    if sprite is None:
+        if pygame.display.get_surface() is None:
+            return None  # No window to draw on, so don't pay for decoding
+        sprite = _sprites[color, name, size] = _load(color, name, size).convert_alpha()
+    return sprite
+
+
+def clear_sprites():
+    _sprites.clear()
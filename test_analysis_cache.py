@@ -0,0 +1,58 @@
+# test_analysis_cache.py
+
+import itertools
+
+import chess.engine
+import pytest
+
+import analysis_cache
+from analysis_cache import AnalysisCache
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+AFTER_E4 = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+AFTER_D4 = "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq - 0 1"
+LIMIT = chess.engine.Limit(time=0.1)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # One second per call, so every write and touch gets a distinct timestamp
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(analysis_cache.time, "time", lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "analysis.sqlite"), max_entries=2, prune_every=1, touch_interval=0)
+    yield cache
+    cache.close()
+
+
+def test_hits_and_misses_are_counted(cache):
+    assert cache.get(START, LIMIT) is None
+    cache.put(START, LIMIT, "e2e4")
+    # Move counters and the search limit's spelling don't matter; the limit's values do
+    assert cache.get(START.replace(" 0 1", " 3 7"), "time=0.1") == "e2e4"
+    assert cache.get(START, chess.engine.Limit(depth=10)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_entry_is_evicted(clock, cache):
+    cache.put(START, LIMIT, "e2e4")
+    cache.put(AFTER_E4, LIMIT, "e7e5")
+    assert cache.get(START, LIMIT) == "e2e4"
+    cache.put(AFTER_D4, LIMIT, "d7d5")
+    assert len(cache) == 2
+    assert cache.get(AFTER_E4, LIMIT) is None
+    assert cache.get(START, LIMIT) == "e2e4"
+    assert cache.get(AFTER_D4, LIMIT) == "d7d5"
+
+
+def test_hits_within_touch_interval_leave_recency_alone(clock, tmp_path):
+    cache = AnalysisCache(str(tmp_path / "analysis.sqlite"), max_entries=2, prune_every=1, touch_interval=3600)
+    cache.put(START, LIMIT, "e2e4")
+    cache.put(AFTER_E4, LIMIT, "e7e5")
+    assert cache.get(START, LIMIT) == "e2e4"
+    cache.put(AFTER_D4, LIMIT, "d7d5")
+    assert cache.get(START, LIMIT) is None
+    cache.close()
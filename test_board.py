@@ -0,0 +1,111 @@
+# test_board.py
+
+import pytest
+
+from board import Board
+from perft import POSITIONS, perft
+
+
+@pytest.mark.parametrize("fen", [
+    "4k3/8/8/8/8/8/3P4/4K3 w - e3 0 1",  # ep square on the wrong rank for the side to move
+    "4k3/8/8/8/4P3/8/8/4K3 b - e6 0 1",  # ...and for Black
+    "4k3/8/8/8/8/8/8/4K3 w - e6 0 1",  # no pawn in front of the ep square
+    "4k3/8/4p3/4p3/8/8/8/4K3 w - e6 0 1",  # ep square occupied
+    "4k3/4p3/8/4p3/8/8/8/4K3 w - e6 0 1",  # pawn's origin square occupied
+    "4k3/8/8/4P3/8/8/8/4K3 w - e6 0 1",  # the pawn in front is not an enemy pawn
+    "4k3/8/8/8/8/8/8/4K3 w - - -1 1",
+    "4k3/8/8/8/8/8/8/4K3 w - - 0 0",
+    "4k2P/8/8/8/8/8/8/4K3 w - - 0 1",
+    "4k3/8/8/8/8/8/8/p3K3 b - - 0 1",
+])
+def test_set_fen_rejects_invalid_positions(fen):
+    with pytest.raises(ValueError):
+        Board(fen)
+
+
+def test_set_fen_accepts_en_passant_after_double_push():
+    board = Board("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+    assert "e5d6" in [move.uci() for move in board.legal_moves()]
+    assert board.fen() == "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1"
+
+
+def test_set_fen_ignores_en_passant_nobody_can_take():
+    board = Board("4k3/8/8/8/4P3/8/8/4K3 b - e3 0 1")
+    assert board.fen() == "4k3/8/8/8/4P3/8/8/4K3 b - - 0 1"
+
+
+@pytest.mark.parametrize("name", list(POSITIONS))
+def test_fen_round_trip(name):
+    fen = POSITIONS[name][0]
+    assert Board(fen).fen() == fen
+
+
+@pytest.mark.parametrize("name", list(POSITIONS))
+def test_perft_matches_reference_counts(name):
+    fen, counts = POSITIONS[name]
+    board = Board(fen)
+    for depth, expected in enumerate(counts[:3], start=1):
+        assert perft(board, depth) == expected
+
+
+@pytest.mark.parametrize("name", list(POSITIONS))
+def test_push_pop_restores_state_and_key(name):
+    board = Board(POSITIONS[name][0])
+    fen, key = board.fen(), board.key
+    for move in board.legal_moves():
+        board.push(move)
+        # The incrementally updated key matches one computed from scratch
+        assert board.key == Board(board.fen()).key
+        assert board.pop() == move
+        assert (board.fen(), board.key) == (fen, key)
+
+
+def test_is_repetition_counts_returns_to_the_same_position():
+    board = Board()
+    shuffle = ["g1f3", "g8f6", "f3g1", "f6g8"]
+    for uci in shuffle:
+        board.push_uci(uci)
+    assert board.is_repetition(2)
+    assert not board.is_repetition(3)
+    for uci in shuffle:
+        board.push_uci(uci)
+    assert board.is_repetition(3)
+
+
+def test_is_repetition_stops_at_irreversible_moves():
+    board = Board()
+    for uci in ["g1f3", "g8f6", "f3g1", "f6g8", "e2e4", "e7e5"]:
+        board.push_uci(uci)
+    assert not board.is_repetition(2)
+
+
+@pytest.mark.parametrize("fen, san, uci", [
+    (POSITIONS["start"][0], "Nf3", "g1f3"),
+    (POSITIONS["kiwipete"][0], "O-O-O", "e1c1"),
+    (POSITIONS["kiwipete"][0], "Bxa6", "e2a6"),
+    (POSITIONS["kiwipete"][0], "Nxf7", "e5f7"),
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "exd6", "e5d6"),
+    ("4k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a8=Q+", "a7a8q"),
+    ("7k/8/8/8/8/8/8/R3K2R w KQ - 0 1", "Ra8+", "a1a8"),
+    ("4k3/8/8/8/8/8/4K3/R6R w - - 0 1", "Rad1", "a1d1"),
+    ("4k3/8/8/R7/8/8/4K3/R7 w - - 0 1", "R1a3", "a1a3"),
+    ("6k1/8/8/8/Q7/8/8/Q2QK3 w - - 0 1", "Qa1d4", "a1d4"),
+    ("6k1/5ppp/8/8/8/8/8/R3K3 w Q - 0 1", "Ra8#", "a1a8"),
+    ("4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1", "Nbd2", "b1d2"),
+])
+def test_san_round_trip(fen, san, uci):
+    board = Board(fen)
+    move = board.parse_san(san)
+    assert move.uci() == uci
+    assert board.san(move) == san
+
+
+@pytest.mark.parametrize("san", ["Nd2", "Qh5", "e5", "Zz9"])
+def test_parse_san_rejects_illegal_moves(san):
+    with pytest.raises(ValueError):
+        Board().parse_san(san)
+
+
+def test_parse_san_rejects_ambiguous_moves():
+    with pytest.raises(ValueError):
+        Board("4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1").parse_san("Nd2")
@@ -0,0 +1,20 @@
+# test_pgn.py
+
+from pgn import read_games, replay_game
+
+
+def _replay(tmp_path, text):
+    path = tmp_path / "games.pgn"
+    path.write_text(text)
+    return [replay_game(game) for game in read_games(str(path))]
+
+
+def test_rest_of_line_comment_ends_at_the_newline(tmp_path):
+    results = _replay(tmp_path, '[Result "*"]\n\n1. e4 e5 ; note {\n2. Nf3 Nc6 3. Bb5 a6 *\n')
+    assert [(result.plies, result.error) for result in results] == [(6, None)]
+
+
+def test_bracket_line_inside_brace_comment_is_not_a_tag(tmp_path):
+    results = _replay(tmp_path, '[Result "*"]\n\n1. e4 {clock\n[%clk 0:01:00]} e5 2. Nf3 *\n\n'
+                                '[Result "*"]\n\n1. d4 *\n')
+    assert [result.plies for result in results] == [3, 1]
@@ -0,0 +1,34 @@
+# test_timecontrol.py
+
+import pytest
+
+from timecontrol import GameClock, TimeControl
+
+
+def test_parse_and_format():
+    assert TimeControl.parse("60+0.5") == TimeControl(60.0, 0.5)
+    assert TimeControl.parse("300") == TimeControl(300.0, 0.0)
+    assert str(TimeControl(60, 0.5)) == "60+0.5"
+
+
+def test_budget_spreads_remaining_time_over_the_expected_moves():
+    clock = GameClock(TimeControl(60, 1), overhead=0.0)
+    assert clock.budget('w', 1) == pytest.approx(60 / 40 + 0.75)
+    # Late in the game the horizon stops shrinking at 15 moves
+    assert clock.budget('w', 100) == pytest.approx(60 / 15 + 0.75)
+    assert GameClock(TimeControl(60), moves_to_go=10, overhead=0.0).budget('w') == pytest.approx(6.0)
+
+
+def test_budget_is_capped_and_floored():
+    clock = GameClock(TimeControl(1, 10), overhead=0.0, min_time=0.01)
+    assert clock.budget('w') == pytest.approx(1 / 3)
+    clock.remaining['w'] = 0.0
+    assert clock.budget('w') == 0.01
+
+
+def test_charge_adds_the_increment_until_the_flag_falls():
+    clock = GameClock(TimeControl(10, 2))
+    assert clock.charge('w', 3.0)
+    assert clock.remaining == {'w': 9.0, 'b': 10.0}
+    assert not clock.charge('b', 10.5)
+    assert clock.remaining['b'] < 0
@@ -0,0 +1,45 @@
+# timecontrol.py
+
+from typing import Dict, NamedTuple, Optional
+
+
+class TimeControl(NamedTuple):
+    base: float
+    increment: float = 0.0
+
+    @classmethod
+    def parse(cls, text: str) -> 'TimeControl':
+        # "60+0.5" is one minute per side plus half a second per move
+        base, _, increment = text.partition('+')
+        return cls(float(base), float(increment or 0))
+
+    def __str__(self) -> str:
+        return f"{self.base:g}+{self.increment:g}"
+
+
+class GameClock:
+    # Remaining time for both sides plus the per-move budget an engine may spend.
+    # The game loop charges each move; engines only read budget().
+    def __init__(self, time_control: TimeControl, moves_to_go: Optional[int] = None, overhead: float = 0.05,
+                 min_time: float = 0.01):
+        self.time_control = time_control
+        self.moves_to_go = moves_to_go
+        self.overhead = overhead
+        self.min_time = min_time
+        self.remaining: Dict[str, float] = {'w': time_control.base, 'b': time_control.base}
+
+    def budget(self, color: str, fullmove_number: int = 1) -> float:
+        remaining = self.remaining[color] - self.overhead
+        # Assume the game lasts about 40 more moves early on, tapering to a floor of 15
+        moves_left = self.moves_to_go or max(15, 40 - fullmove_number // 2)
+        budget = remaining / moves_left + self.time_control.increment * 0.75
+        # Never bet more than a third of what's left on a single move
+        return max(self.min_time, min(budget, remaining / 3))
+
+    def charge(self, color: str, elapsed: float) -> bool:
+        # Returns False when the flag falls
+        self.remaining[color] -= elapsed
+        if self.remaining[color] < 0:
+            return False
+        self.remaining[color] += self.time_control.increment
+        return True